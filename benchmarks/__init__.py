@@ -0,0 +1 @@
+"""Benchmarks of the PBC computation and rendering path."""
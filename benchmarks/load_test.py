@@ -0,0 +1,215 @@
+"""Simulate many concurrent sessions of the app and report rerun latency.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --sessions 50 --out load.json
+    python -m benchmarks.load_test --url http://localhost:8501 --sessions 50
+
+Without ``--url`` a Streamlit server is started on a free port with a
+synthetic dataset (or ``--dataset``) and stopped at the end. Every session
+opens its own websocket to the server, like a browser tab, runs the app and
+then moves between the lesson steps in random order. The time from sending
+a rerun to the end of the script is recorded, and the p50/p99 are reported
+separately for the first run of a session and for the reruns after it.
+
+Needs the ``websockets`` package.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.run import metadata, synthetic_values
+
+APP = Path(__file__).resolve().parent.parent / 'learn_to_build_a_pbc_app.py'
+STEP_LABEL = 'Select a step'
+# Seconds allowed for the server to come up and for a single rerun
+STARTUP_TIMEOUT = 60
+RERUN_TIMEOUT = 120
+
+
+def _websockets():
+    try:
+        import websockets
+    except ImportError as error:
+        raise ImportError('the load test needs the websockets package') from error
+    return websockets
+
+
+def _protos():
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from streamlit.proto.Selectbox_pb2 import Selectbox
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    return BackMsg, ForwardMsg, Selectbox, WidgetState
+
+
+class Session:
+    """One browser tab: a websocket to the server and the state of the step selector."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.steps = None
+        self.exceptions = 0
+
+    async def rerun(self, step=None) -> float:
+        """Rerun the app, on ``step`` when given, and return the seconds it took."""
+        BackMsg, ForwardMsg, Selectbox, WidgetState = _protos()
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.page_script_hash = ''
+        if step is not None:
+            box = self.steps
+            state = WidgetState(id=box.id)
+            # Newer Streamlit keeps the option itself, older the index of it
+            if 'accept_new_options' in Selectbox.DESCRIPTOR.fields_by_name:
+                state.string_value = step
+            else:
+                state.int_value = list(box.options).index(step)
+            message.rerun_script.widget_states.widgets.append(state)
+
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await asyncio.wait_for(self.websocket.recv(), RERUN_TIMEOUT))
+            kind = reply.WhichOneof('type')
+            if kind == 'script_finished':
+                return time.perf_counter() - start
+            if kind == 'delta' and reply.delta.WhichOneof('type') == 'new_element':
+                element = reply.delta.new_element
+                if element.WhichOneof('type') == 'exception':
+                    self.exceptions += 1
+                elif element.WhichOneof('type') == 'selectbox' and \
+                        element.selectbox.label == STEP_LABEL:
+                    self.steps = element.selectbox
+
+
+async def simulate(url: str, sessions: int, reruns: int, seed: int = 0) -> dict:
+    """Run ``sessions`` concurrent sessions of ``reruns`` step changes each."""
+    websockets = _websockets()
+    stream = url.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+    latencies = {'first': [], 'rerun': []}
+    errors = []
+    exceptions = 0
+
+    async def session(number):
+        nonlocal exceptions
+        rng = random.Random(seed + number)
+        try:
+            async with websockets.connect(stream, subprotocols=['streamlit'],
+                                          max_size=None) as websocket:
+                tab = Session(websocket)
+                latencies['first'].append(await tab.rerun())
+                for _ in range(reruns):
+                    if tab.steps is None:
+                        break
+                    step = rng.choice(list(tab.steps.options))
+                    latencies['rerun'].append(await tab.rerun(step))
+                exceptions += tab.exceptions
+        except Exception as error:
+            errors.append(repr(error))
+
+    await asyncio.gather(*(session(number) for number in range(sessions)))
+    return {'latencies': latencies, 'errors': errors, 'exceptions': exceptions}
+
+
+def percentiles(latencies) -> dict:
+    if not latencies:
+        return {'count': 0}
+    array = np.asarray(latencies)
+    return {'count': len(array), 'p50': float(np.percentile(array, 50)),
+            'p99': float(np.percentile(array, 99)), 'max': float(array.max())}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(dataset: str, port: int) -> subprocess.Popen:
+    """Start ``streamlit run`` on the app and wait until it answers."""
+    env = dict(os.environ, PBC_DATASET=dataset)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', str(APP), '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen('http://127.0.0.1:{}/_stcore/health'.format(port), timeout=1)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('the Streamlit server did not start')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='app to test; a server is started when omitted')
+    parser.add_argument('--dataset', help='PBC_DATASET of the started server '
+                                          '(default: synthetic data)')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='points of the synthetic dataset')
+    parser.add_argument('--sessions', type=int, default=50, help='concurrent sessions')
+    parser.add_argument('--reruns', type=int, default=10, help='step changes per session')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    server = None
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.url
+        if url is None:
+            dataset = args.dataset
+            if dataset is None:
+                dataset = str(Path(workdir) / 'data.csv')
+                pd.DataFrame({'Value': synthetic_values(args.size)}).to_csv(dataset)
+            port = _free_port()
+            server = start_server(dataset, port)
+            url = 'http://127.0.0.1:{}'.format(port)
+        try:
+            start = time.perf_counter()
+            outcome = asyncio.run(simulate(url, args.sessions, args.reruns, args.seed))
+            elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {
+        'meta': dict(metadata(), url=url, sessions=args.sessions, reruns=args.reruns,
+                     seconds=elapsed),
+        'results': {kind: percentiles(values)
+                    for kind, values in outcome['latencies'].items()},
+        'errors': outcome['errors'],
+        'exceptions': outcome['exceptions'],
+    }
+    for kind, row in report['results'].items():
+        if row['count']:
+            print('{:<6} {:>6} runs  p50 {:8.3f}s  p99 {:8.3f}s  max {:8.3f}s'.format(
+                kind, row['count'], row['p50'], row['p99'], row['max']))
+    print('{} sessions in {:.1f}s, {} failed, {} app exceptions'.format(
+        args.sessions, elapsed, len(outcome['errors']), outcome['exceptions']))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return 1 if outcome['errors'] or outcome['exceptions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
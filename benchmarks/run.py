@@ -0,0 +1,186 @@
+"""Time the PBC computation and rendering path on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --sizes 100 10000 --compare bench.json
+
+Every benchmark runs at each size (10^2 to 10^7 points by default) on data
+generated locally, so no network is needed. Results are written as JSON;
+``--compare`` reports the ratio against an earlier run and exits with status
+1 when any benchmark got slower than ``--threshold``.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pbc.data import DatasetLoader
+from pbc.rules import xmr_signals
+from pbc.xmr import compute_xmr
+
+DEFAULT_SIZES = (10**2, 10**3, 10**4, 10**5, 10**6, 10**7)
+# Keep repeating a benchmark until this much time was spent on it
+MIN_TOTAL_SECONDS = 0.5
+MAX_REPEATS = 50
+
+
+def synthetic_values(size: int, seed: int = 0) -> np.ndarray:
+    """Positive process data with a few shifts and outliers."""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(10.0, 1.0, size)
+    shifts = rng.integers(0, size, max(size // 10_000, 1))
+    for start in shifts:
+        values[start:start + 50] += 3.0
+    values[rng.integers(0, size, max(size // 1_000, 1))] += 6.0
+    return np.abs(values)
+
+
+def timeit(func, setup=None):
+    """Run ``func`` repeatedly and return the individual timings in seconds."""
+    timings = []
+    while True:
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+        if sum(timings) >= MIN_TOTAL_SECONDS or len(timings) >= MAX_REPEATS:
+            return timings
+
+
+def bench_load(size, values, workdir):
+    path = Path(workdir) / 'data_{}.csv'.format(size)
+    if not path.exists():
+        pd.DataFrame({'Value': values}).to_csv(path)
+    source = str(path)
+    warm = DatasetLoader(cache_dir=None)
+    warm.load(source, index_col=0)
+    return {
+        'load_cold': timeit(lambda loader: loader.load(source, index_col=0),
+                            setup=lambda: DatasetLoader(cache_dir=None)),
+        'load_warm': timeit(lambda _: warm.load(source, index_col=0)),
+    }
+
+
+def bench_compute(size, values, workdir):
+    return {
+        'compute_xmr': timeit(lambda _: compute_xmr(values)),
+        'moving_range': timeit(lambda _: compute_xmr(values).moving_range),
+    }
+
+
+def bench_detect(size, values, workdir):
+    result = compute_xmr(values)
+    return {
+        'detect_signals': timeit(lambda _: xmr_signals(result)),
+    }
+
+
+def bench_figure(size, values, workdir):
+    # plotly is only needed for this group
+    import plotly.io as pio
+
+    from pbc.charts import x_chart
+
+    result = compute_xmr(values)
+    keep = xmr_signals(result).any()
+    limits = result.limits.rounded(2)
+    return {
+        'figure_build': timeit(lambda _: x_chart(result, limits, keep)),
+        # What st.plotly_chart does with the figure on every rerun
+        'figure_serialize': timeit(lambda fig: pio.to_json(fig),
+                                   setup=lambda: x_chart(result, limits, keep)),
+    }
+
+
+GROUPS = {
+    'load': bench_load,
+    'compute': bench_compute,
+    'detect': bench_detect,
+    'figure': bench_figure,
+}
+
+
+def summarize(timings):
+    return {
+        'repeats': len(timings),
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+    }
+
+
+def metadata():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__,
+                'pandas': pd.__version__}
+    try:
+        import plotly
+        versions['plotly'] = plotly.__version__
+    except ImportError:
+        pass
+    return {'platform': platform.platform(), 'versions': versions,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run(sizes, groups, workdir, log=print):
+    results = []
+    for size in sizes:
+        values = synthetic_values(size)
+        for group in groups:
+            for name, timings in GROUPS[group](size, values, workdir).items():
+                row = dict(name=name, size=size, **summarize(timings))
+                results.append(row)
+                log('{:<18} {:>10,}  min {:10.6f}s  median {:10.6f}s'.format(
+                    name, size, row['min'], row['median']))
+    return {'meta': metadata(), 'results': results}
+
+
+def compare(current, baseline, threshold):
+    """Print the change against ``baseline``; return True if anything regressed."""
+    previous = {(row['name'], row['size']): row['min'] for row in baseline['results']}
+    regressed = False
+    for row in current['results']:
+        before = previous.get((row['name'], row['size']))
+        if not before:
+            continue
+        ratio = row['min'] / before
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print('{:<18} {:>10,}  {:6.2f}x{}'.format(row['name'], row['size'], ratio, flag))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--groups', nargs='+', choices=sorted(GROUPS),
+                        default=list(GROUPS))
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run(args.sizes, args.groups, workdir)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
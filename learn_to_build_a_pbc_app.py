@@ -1,7 +1,29 @@
+import time
+script_start = time.perf_counter()  # for measuring the cold start
+
+import inspect
+import os
+from pathlib import Path
+
+import numpy as np
 import pandas as pd  # read csv, df manipulation
-import plotly.express as px  # interactive charts
 import streamlit as st  # 🎈 data web app development
-from PIL import Image
+# plotly and PIL are imported when a chart or image is first shown
+
+from pbc import instrument
+# cached, offline-capable dataset loading, shared by every session
+from pbc.data import clear_datasets, load_dataset, load_datasets
+from pbc.export import FORMATS as EXPORT_FORMATS, available_formats, export_path, frame_hash
+from pbc.cache import cache_stats, cached_xmr, chart_cache, data_hash, memoize  # per-dataset memoization
+from pbc.rules import detect_signals, xmr_signals  # special cause rules
+from pbc.attribute import attribute_signals, compute_attribute
+from pbc.changepoint import suggest_breakpoints
+from pbc.phases import PhaseIndex, phase_signals
+from pbc.quiz import QUESTIONS, answer_key
+from pbc.store import SummaryStore
+from pbc.subgroup import SubgroupLimits, compute_subgroups, subgroup_signals
+
+instrument.start(script_start)
 
 im="chart_with_upwards_trend"
 st.set_page_config(
@@ -9,51 +31,256 @@ st.set_page_config(
     page_icon=im,
     initial_sidebar_state='collapsed')
 
+# Timings per rerun, shown in the sidebar with PBC_DEBUG=1 or ?debug=1
+def debug_requested():
+    if instrument.debug_enabled():
+        return True
+    if hasattr(st, 'experimental_get_query_params'):
+        return st.experimental_get_query_params().get('debug', ['0'])[0] not in ('', '0')
+    return st.query_params.get('debug', '0') not in ('', '0')
+
+debug = debug_requested()
+timings = instrument.Timings(enabled=debug)
+profiler = instrument.start_profile() if debug and st.session_state.get('profile_rerun') else None
+
 st.title("Learn to build a Process Behavior Chart")
 #st.markdown("### By Jim Lehner")
 
 # read_csv from github repo
 #dataset_url = "https://raw.githubusercontent.com/jimlehner/datasets/main/sales_data.csv"
 # dataset_url = "https://raw.githubusercontent.com/jimlehner/datasets/main/How_to_build_a_PBC_Manufacturing%20Data.csv"
-dataset_url = "https://raw.githubusercontent.com/jimlehner/datasets/main/learn_to_build_a_pbc_manufacturing_data.csv"
+# Set PBC_DATASET to a URL, file:// URL or local path to use your own data,
+# or to several of them separated by spaces to choose one in the sidebar
+dataset_sources = os.environ.get(
+    'PBC_DATASET',
+    "https://raw.githubusercontent.com/jimlehner/datasets/main/learn_to_build_a_pbc_manufacturing_data.csv").split()
 worksheet_url = "https://github.com/jimlehner/datasets/blob/2513d674c4029c9616082f4a4b6e924802ac588a/How_to_build_a_PBC_worksheet_childhood_poverty_data.xlsx"
 
-# Read csv from URL
+# Read csv from URL. The parsed frame is kept in memory between reruns.
+# Several sources are fetched at the same time; those that fail are left out.
 def get_data() -> pd.DataFrame:
-    return pd.read_csv(dataset_url, index_col=0)
+    read_kwargs = dict(index_col=0, dtype={'Value': 'float64'})
+    if len(dataset_sources) == 1:
+        return load_dataset(dataset_sources[0], **read_kwargs)
+    frames = load_datasets(dataset_sources, return_exceptions=True, **read_kwargs)
+    loaded = {source: frame for source, frame in zip(dataset_sources, frames)
+              if not isinstance(frame, Exception)}
+    if not loaded:
+        raise frames[0]
+    return loaded[st.sidebar.selectbox('Dataset', list(loaded))]
 
 # Get data 
-df = get_data()
-
-# Create dataframe that includes moving range values
-mR_df = df.copy()
-mR_df['Moving range'] = abs(df['Value'].diff())
-
-# Create AmR_df
-AmR_df = mR_df.copy()
-AmR_df['AmR'] = round(mR_df['Moving range'].mean(),2)
-
-# Create process_limit_df
-process_limit_df = AmR_df.copy()
-
-# Calculate process limits 
-mean = round(df['Value'].mean(),2)
-AmR = round(mR_df['Moving range'].mean(),2)
-UPL = round(mean + (2.66*AmR),2)
-LPL = round(mean - (2.66*AmR),2)
-LPL = max(LPL, 0.00)
-URL = round(3.27*AmR,2)
-process_limit_df['UPL'] = [UPL]*len(df)
-process_limit_df['LPL'] = [LPL]*len(df)
-process_limit_df['URL'] = [URL]*len(df)
-
-# Complete dataframe
-complete_df = process_limit_df.copy()
-complete_df['Mean'] = [mean]*len(df)
-
-# Special cause dataframe
-special_cause_df = complete_df[(complete_df['Value'] > UPL) |
-                               (complete_df['Value'] == LPL)]
+with timings.stage('load'):
+    df = get_data()
+
+# Calculate the XmR chart once per dataset; limits are rounded the way they are by hand
+with timings.stage('compute'):
+    data_key = data_hash(df['Value'])
+    xmr = cached_xmr(df['Value'], key=data_key)
+    limits = xmr.limits.rounded(2, lpl_floor=0.00)
+    mean, AmR, UPL, LPL, URL = limits[:5]
+
+# Special cause dataframe: points beyond the limits. Only their positions are kept.
+def special_cause_rows(values, mean, UPL, LPL):
+    report = detect_signals(values, mean, UPL, LPL, rules=('beyond_limits',))
+    return np.flatnonzero(report.masks['beyond_limits'])
+
+# Dataframes shown in the lessons. Only the values and the scalar limits are
+# kept; a frame, with its constant columns, is built on the rerun that shows it.
+LESSON_COLUMNS = {
+    'mR': ['Moving range'],
+    'AmR': ['Moving range', 'AmR'],
+    'process_limit': ['Moving range', 'AmR', 'UPL', 'LPL', 'URL'],
+    'complete': ['Moving range', 'AmR', 'UPL', 'LPL', 'URL', 'Mean'],
+}
+
+def lesson_frame(name, rows=None):
+    with timings.stage('frame'):
+        return xmr.to_frame(LESSON_COLUMNS[name], base=df, limits=limits, rows=rows)
+
+# Summary of the dataset: its limits, signal positions and decimated chart
+# points. It comes from the on-disk summary store, shared by every session and
+# process, so a dataset seen before is neither checked nor decimated again.
+# Points flagged by any rule are always drawn when long charts are decimated.
+@st.cache_resource
+def get_summary_store():
+    return SummaryStore()
+
+def lesson_summary():
+    return memoize('summary', df['Value'].to_numpy(), get_summary_store().get_or_compute,
+                   data_key, key=data_key)
+
+def signal_mask(values):
+    return lesson_summary().signal_mask()
+
+with timings.stage('detect'):
+    special_causes = memoize('special_cause', df['Value'].to_numpy(), special_cause_rows,
+                             mean, UPL, LPL, key=data_key)
+    signal_points = memoize('signals', df['Value'].to_numpy(), signal_mask, key=data_key)
+
+# Images are decoded once per process
+image_dir = Path(__file__).parent / 'images'
+
+@st.cache_resource
+def load_image(name):
+    from PIL import Image
+    image = Image.open(image_dir / name)
+    image.load()
+    return image
+
+@st.cache_resource
+def load_image_bytes(name):
+    return (image_dir / name).read_bytes()
+
+# Exports are keyed on the whole frame (index and columns too), hashed once per
+# loaded frame rather than on every rerun
+def export_key(df):
+    frame, key = st.session_state.get('export_key', (None, None))
+    if frame is not df:
+        key = frame_hash(df)
+        st.session_state['export_key'] = (df, key)
+    return key
+
+# Download buttons for the dataset. Each format is serialized once per dataset
+# and its bytes are shared by every step and session. CSV is always offered;
+# the other formats are only written once they are picked.
+def download_data(df, file_stem):
+    key = export_key(df)
+
+    def download_button(fmt):
+        label, extension, mime, _ = EXPORT_FORMATS[fmt]
+        data = memoize('export', df['Value'].to_numpy(),
+                       lambda values, fmt: export_path(df, fmt, key=key).read_bytes(),
+                       fmt, key=key)
+        st.download_button(label='Download data as ' + label, data=data,
+                           file_name=file_stem + extension, mime=mime)
+
+    download_button('csv')
+    other_formats = [fmt for fmt in available_formats(len(df)) if fmt != 'csv']
+    if other_formats:
+        fmt = st.selectbox('Other formats', ['-'] + other_formats, key=file_stem + '_format',
+                           format_func=lambda fmt: EXPORT_FORMATS[fmt][0] if fmt != '-' else '-')
+        if fmt != '-':
+            download_button(fmt)
+
+# Every chart gets its own key, so two charts that happen to be identical are
+# still two elements. Streamlit only takes a key for charts from 1.35 on.
+_chart_keys = 'key' in inspect.signature(st.plotly_chart).parameters
+
+def show_chart(fig, key, **kwargs):
+    if _chart_keys:
+        kwargs['key'] = key
+    with timings.stage('plotly_chart'):
+        st.plotly_chart(fig, **kwargs)
+
+# X-chart and mR-chart. Each is built once per dataset and rounding, with every
+# limit line, and the checkboxes only toggle the visibility of the lines. The
+# charts of the dataset itself are drawn from its stored summary; other
+# results (e.g. robust limits) from the result, keeping the points that signal
+# against that result's own limits.
+def xmr_figure(kind, decimals, result):
+    from pbc.charts import cached_chart, cached_summary_chart
+    if result is None:
+        summary = lesson_summary()
+        return cached_summary_chart(kind, summary, summary.limits.rounded(decimals),
+                                    data_key, labels=df.index)
+    keep = memoize('result_signals', result.values,
+                   lambda values, limits: xmr_signals(result).any(),
+                   tuple(result.limits), key=data_key)
+    return cached_chart(kind, result, result.limits.rounded(decimals), data_key, keep=keep)
+
+def plot_x_chart(decimals=1, show_mean=True, show_UPL=True, show_LPL=True, result=None,
+                 key='x_chart'):
+    with timings.stage('figure'):
+        from pbc.charts import with_visible
+        fig = with_visible(xmr_figure('x', decimals, result),
+                           Mean=show_mean, UPL=show_UPL, LPL=show_LPL)
+    timings.payload('x_chart', fig)
+    show_chart(fig, key, use_container_width=True)
+
+def plot_mr_chart(decimals=2, show_AmR=True, show_URL=True, result=None, key='mr_chart'):
+    with timings.stage('figure'):
+        from pbc.charts import with_visible
+        fig = with_visible(xmr_figure('mr', decimals, result), AmR=show_AmR, URL=show_URL)
+    timings.payload('mr_chart', fig)
+    show_chart(fig, key)
+
+# X-chart and mR-chart with limits per phase. The prefix sums of the data are
+# kept, so moving a breakpoint only looks up the sums of the phases.
+def plot_phase_charts(breakpoints, decimals=2):
+    with timings.stage('compute'):
+        index = memoize('phase_index', df['Value'].to_numpy(), lambda values: PhaseIndex(xmr),
+                        key=data_key)
+        phases = index.phases(breakpoints, lpl_floor=0.00)
+        phases = tuple(phase._replace(limits=phase.limits.rounded(decimals, lpl_floor=0.00))
+                       for phase in phases)
+    with timings.stage('detect'):
+        keep = phase_signals(xmr, phases).any()
+    with timings.stage('figure'):
+        from pbc.charts import cached_chart
+        figures = [cached_chart(chart, xmr, phases, data_key, keep=keep)
+                   for chart in ('x_phases', 'mr_phases')]
+    for chart, fig in zip(('x_phases', 'mr_phases'), figures):
+        show_chart(fig, chart, use_container_width=True)
+    return phases
+
+# Quiz questions. Questions, choices and feedback are rows of pbc.quiz.QUESTIONS
+# and the answers and distractors are generated once per dataset. Each question
+# sits in a form, so picking an answer does not rerun the script until it is
+# checked; where Streamlit has fragments only the question itself is rerun.
+with timings.stage('compute'):
+    quiz = memoize('quiz', df['Value'].to_numpy(), answer_key, key=data_key)
+    quiz_text = quiz.text
+
+def ask(key):
+    question = QUESTIONS[key]
+    choices = quiz.choices.get(key)
+    if choices is None:
+        st.caption('This dataset is too short for this question.')
+        return
+    with st.form(key + '_form'):
+        answer = st.selectbox(question.prompt, ['-'] + [label for label, _, _ in choices],
+                              key=key)
+        st.form_submit_button('Check answer')
+    for label, feedback, _ in choices:
+        if label == answer:
+            st.markdown(feedback)
+
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+if _fragment is not None:
+    ask = _fragment(ask)
+
+# p, np, c and u charts of a count column (and a sample size column), with
+# limits that follow the sample size of every point
+def plot_attribute_chart(kind, count, size=None):
+    counts = df[count].to_numpy()
+    sizes = df[size].to_numpy() if size is not None else None
+    with timings.stage('compute'):
+        key = (data_hash(counts), data_hash(sizes) if size is not None else None, kind)
+        result = compute_attribute(counts, sizes, kind)
+    with timings.stage('detect'):
+        keep = attribute_signals(result).any()
+    with timings.stage('figure'):
+        from pbc.charts import cached_chart
+        fig = cached_chart('attribute', result, result.limits, key, keep=keep)
+    show_chart(fig, 'attribute_chart', use_container_width=True)
+
+# Xbar-R and Xbar-S charts for data sampled in subgroups, drawn by the same
+# cached chart code as the X-chart and mR-chart
+def plot_subgroup_charts(n, kind):
+    with timings.stage('compute'):
+        subgroups = memoize('subgroups', df['Value'].to_numpy(), compute_subgroups,
+                            n, kind, 0.0, key=data_key)
+    with timings.stage('detect'):
+        keep = subgroup_signals(subgroups).any()
+    with timings.stage('figure'):
+        from pbc.charts import cached_chart
+        key = (data_key, kind, n)
+        limits = SubgroupLimits(*np.round(subgroups.limits, 2))
+        figures = [cached_chart(chart, subgroups, limits, key, keep=keep)
+                   for chart in ('xbar', 'spread')]
+    for chart, fig in zip(('xbar', 'spread'), figures):
+        show_chart(fig, chart + '_chart', use_container_width=True)
 
 # Sidebar
 with st.sidebar:
@@ -156,17 +383,7 @@ if select_step == "Introduction":
         st.dataframe(df,height=425, width=250)
     
     with col2:
-        @st.cache_data
-        def convert_df(df):
-        # IMPORTANT: Cache the conversion to prevent computation at on every rerun
-            return df.to_csv().encode('utf-8')
-
-        csv = convert_df(df)
-        st.download_button(
-            label='Download data as CSV',
-            data=csv,
-            file_name='manufacturing_process_data.csv',
-            mime='text/csv')
+        download_data(df, 'manufacturing_process_data')
 
 elif select_step == 'Step 1: Gather the data':
     st.markdown("## Step 1: Gather the data")
@@ -183,10 +400,7 @@ elif select_step == 'Step 1: Gather the data':
         """
     )
     
-# =============================================================================
-    DGP_image = Image.open(r'images\Data Generating Process - DGP_cropped.png')
-# =============================================================================
-    # DGP_image = Image.open('Data Generating Process - DGP_cropped.png')
+    DGP_image = load_image('Data Generating Process - DGP_cropped.png')
 
     st.image(DGP_image, caption='The Data Generating Process (DGP) geneartes data \
              that creates a model used to approximate the DGP.')
@@ -222,17 +436,7 @@ elif select_step == 'Step 1: Gather the data':
         st.dataframe(df)
     
     with col2:
-        @st.cache_data
-        def convert_df(df):
-        # IMPORTANT: Cache the conversion to prevent computation at on every rerun
-            return df.to_csv().encode('utf-8')
-
-        csv = convert_df(df)
-        st.download_button(
-            label='Download data as CSV',
-            data=csv,
-            file_name='manufacturing_data.csv',
-            mime='text/csv')
+        download_data(df, 'manufacturing_data')
 
 
 elif select_step == 'Step 2: Calculate the mean':
@@ -284,47 +488,15 @@ elif select_step == 'Step 2: Calculate the mean':
     with col3:
         st.dataframe(df, height=250)
     with col4:
-        @st.cache_data
-        def convert_df(df):
-        # IMPORTANT: Cache the conversion to prevent computation at on every rerun
-            return df.to_csv().encode('utf-8')
-
-        csv = convert_df(df)
-        st.download_button(
-            label='Download data as CSV',
-            data=csv,
-            file_name='manufacturing_data.csv',
-            mime='text/csv')
+        download_data(df, 'manufacturing_data')
         
     # steps for calculating the mean
     st.write(" ### 1. Sum all of the terms")
-    mean_numerator = st.selectbox("What is the sum of all the values in the 'Values' column in the above table?",
-                                ('-','65.6','6.65','67','66.5'))
-    if mean_numerator == '65.6':
-        st.write(":red[65.6 is incorrect. Try again.]")
-    elif mean_numerator == '6.65':
-        st.write(":red[This is close but the decimal is in the wrong place. Try again!]")
-    elif mean_numerator == '67':
-        st.write(":red[67 is a little high. Try your calculation one more time.]")
-    elif mean_numerator == '66.5':
-        st.markdown(":green[That's correct! The sum of all the values in the 'Values'\
-                    column is 66.5. We will use this value as the numerator when we calculate the mean. Great work! 😄]")
+    ask('mean_numerator')
    
     # step 2 for calculating the mean
     st.write(" ### 2. Determine the number of values")
-    mean_denominator = st.selectbox('How many values are in the data set?',
-                                ('-','0','60','59','15'))
-    if mean_denominator =='0':
-        st.write(":red[By definition of its existence this data set cannot have 0 values. Try again.]")
-    elif mean_denominator == '59':
-        st.write(":red[In Python, the initial element of a sequence is assigned the index 0. \
-                    This is called zero-based numbering. While the table to the left shows 0 to 9 \
-                    in the first column, there is actually more than 9 values in the data set. Try again.]")
-    elif mean_denominator == '60':
-        st.write(":green[That's correct! There are 10 values in the data set. When calculating the mean \
-                    we will use 11 as the denominator.] 😄")
-    elif mean_denominator == '15':
-         st.write(":red[15 is not correct. Try again.]")
+    ask('mean_denominator')
   
                 
     # Step 3 calculate the mean
@@ -334,16 +506,7 @@ elif select_step == 'Step 2: Calculate the mean':
         To calculate the mean divide the sum of all the values in the data set by the total number of values in the data set. 
         """
     )
-    mean_calc = st.selectbox('What is the mean childhood poverty rate for 2010 to 2020?',
-                                ('-','1.12','1.11','2.11','1.01'))
-    if mean_calc =='1.12':
-        st.write(":red[1.12 is the median not the mean. Try again!]")
-    elif mean_calc == '1.11':
-        st.markdown(":green[That's correct! The mean of the 'Value' column is 1.11. Great Work!] 😄")
-    elif mean_calc == '2.11':
-        st.write(":red[That's a little high. Check your calcualtion and try again.]")
-    elif mean_calc == '1.01':
-        st.write(":red[Close but no cigar. Did you miss a decimal point?]")
+    ask('mean_calc')
 
     st.markdown("### Check your work")
     with st.expander("Show calculation of mean"):
@@ -351,11 +514,11 @@ elif select_step == 'Step 2: Calculate the mean':
         mean = \frac{sum-of-all-terms}{number-of-values}
         ''')
         st.latex(r'''
-        mean = \frac{66.5}{60}
-        ''')
+        mean = \frac{%s}{%s}
+        ''' % (quiz_text['sum'], quiz_text['n']))
         st.latex(r'''
-        mean = 1.11
-        ''')
+        mean = %s
+        ''' % quiz_text['mean'])
 
 elif select_step == 'Step 3: Calculate the moving ranges':
     st.markdown("## Step 3: Calculate the moving ranges")
@@ -421,64 +584,24 @@ elif select_step == 'Step 3: Calculate the moving ranges':
         with col5:
             st.dataframe(df)
         with col6:
-            @st.cache_data
-            def convert_df(df):
-            # IMPORTANT: Cache the conversion to prevent computation at on every rerun
-                return df.to_csv().encode('utf-8')
-
-            csv = convert_df(df)
-            st.download_button(
-                label='Download data as CSV',
-                data=csv,
-                file_name='manufacturing_data.csv',
-                mime='text/csv')
+            download_data(df, 'manufacturing_data')
         
     st.markdown(" ### Questions")
     # Question 1
-    mR_Q1 = st.selectbox('How do you calculate a moving range value?',
-                         ('-','Sum all of the values in the dataset',
-                          'Find the difference between subsequent values in a dataset',
-                          'Sum all of the values in a data set and divide by the number of values in the dataset',
-                          'Find the absolute value of the difference between subsequent values in a dataset'))
-    if mR_Q1 == 'Sum all of the values in the dataset':
-        st.markdown(":red[Summing all of the values in the dataset would simply be the sum of all the values in the dataset, not a moving range value. Try again.]")
-    elif mR_Q1 == 'Find the difference between subsequent values in a dataset':
-        st.markdown(":red[Finding the difference between subsequent values is only part of calculating a moving range value]")
-    elif mR_Q1 == 'Sum all of the values in a data set and divide by the number of values in the dataset':
-        st.markdown(":red[This is how you calculate the mean not a moving range value. Try again.]")
-    elif mR_Q1 == 'Find the absolute value of the difference between subsequent values in a dataset.':
-        st.markdown(":green[That's correct! Moving range values are calculated by finding the absolute value of the difference of subsequent values in a dataset. Great job!]")
+    ask('mR_Q1')
 
     # Question 2
-    mR_Q2 = st.selectbox('What is the fifth moving range (mR)?',
-                 ('-','0.82','0.63','-0.63','0.87'))
-    if mR_Q2 == '0.82':
-        st.markdown(":red[0.82 is one of the moving range values but not the fifth moving range value. Try again.]")
-    elif mR_Q2 == '0.63':
-        st.markdown(":green[Correct! The aboslute value of the difference between the forth observation value (1.76) and the fifth observation value (1.12) is 0.63. Great work!]")
-    elif mR_Q2 == '-0.63':
-        st.markdown(":red[-0.63 is not correct. Remember moving range values are the absolute value of the difference between subsequent values in a dataset. Try again.]")
-    elif mR_Q2 == '0.87':
-        st.markdown(":red[0.87 is one of the moving range values but not the fifth moving range value. Try again.]")
+    ask('mR_Q2')
     
     # Question 3
-    mR_Q3 = st.selectbox('What is the tenth moving range (mR) value?',
-                 ('-','-0.05','0','60','0.05'))
-    if mR_Q3 == '-0.05':
-        st.markdown(":red[-0.05 is not correct. Remember moving range values are the absolute value of the difference between subsequent values in a dataset. Try again.]")
-    elif mR_Q3 == '0.82':
-        st.markdown(":red[0.82 is the first moving range value. Try again.]")
-    elif mR_Q3 == '60':
-        st.markdown(":red[60 is the number of values in the dataset not one of the moving range values. Try again.]")
-    elif mR_Q3 == '0.05':
-        st.markdown(":green[Correct! The aboslute value of the difference between the ninth observation value (0.76) and the tenth observation value (0.81) is 0.05. Great work!]")
+    ask('mR_Q3')
 
     st.markdown("With a complete list of moving range values in hand, the next step is to calculate the **average moving range (AmR)**.")
 
     # Dataframe including moving range values
     st.markdown(" ### Check your work")
     with st.expander("See dataframe with moving range values"):
-        st.dataframe(mR_df)
+        st.dataframe(lesson_frame('mR'))
 
 elif select_step == 'Step 4: Calculate the average moving range':
     st.markdown("## Step 4: Calculate the average moving range")
@@ -510,40 +633,13 @@ elif select_step == 'Step 4: Calculate the average moving range':
         ''')
 
     st.markdown(" ### 1: Sum of moving range (mR) values")
-    AmR_numerator = st.selectbox("What is the sum of all the moving range values?",
-                                ('-','28.55','26','25.85','2.58'))
-    if AmR_numerator == '28.55':
-        st.write(":red[That's not correct. Try again.]")
-    elif AmR_numerator == '26':
-        st.write(":red[That's not correct. Try again.]")
-    elif AmR_numerator == '25.85':
-        st.write(":green[Correct! The sum of all the moving range values is 25.85.]")
-    elif AmR_numerator == '2.58':
-        st.markdown(":red[2.58 is not correct. Try again.]")
+    ask('AmR_numerator')
 
     st.markdown(" ### 2: Determine the number of mR values")
-    AmR_denominator = st.selectbox("How many moving range values are in the dataset?",
-                                ('-','59','60','58','61'))
-    if AmR_denominator == '59':
-        st.write(":green[Correct! There are 59 moving range values in the datset.]")
-    elif AmR_denominator == '58':
-        st.write(":red[58 is too few moving range values. Try again.]")
-    elif AmR_denominator == '60':
-        st.write(":red[60 is too many moving range values. Try again.]")
-    elif AmR_denominator == '61':
-        st.markdown(":red[61 is too many moving range values. Try again.]")
+    ask('AmR_denominator')
 
     st.markdown(" ### 3: Calculate the average moving range (AmR)")
-    AmR_denominator = st.selectbox("What is the average moving range?",
-                                ('-','60','1.11','4.40','0.44'))
-    if AmR_denominator == '60':
-        st.write(":red[60 is the number of values in the dataset not the average moving range. Try again.]")
-    elif AmR_denominator == '1.11':
-        st.write(":red[1.11 is the mean not the average moving range of the dataset. Try again.]")
-    elif AmR_denominator == '4.40':
-        st.write(":red[4.40 is not correct. Check your arithmatic and try again.]")
-    elif AmR_denominator == '0.44':
-        st.markdown(":green[Correct! The average moving range for the dataset is 0.44.]")
+    ask('AmR_calc')
 
     st.markdown(
         """
@@ -559,13 +655,13 @@ elif select_step == 'Step 4: Calculate the average moving range':
         AmR = \frac{sum-of-moving-ranges}{number-of-values}
         ''')
         st.latex(r'''
-        AmR = \frac{25.85}{59}
-        ''')
+        AmR = \frac{%s}{%s}
+        ''' % (quiz_text['mr_sum'], quiz_text['n_mr']))
         st.latex(r'''
-        AmR = 0.44
-        ''')
+        AmR = %s
+        ''' % quiz_text['amr'])
     with st.expander("Show dataframe"):
-        st.dataframe(AmR_df)
+        st.dataframe(lesson_frame('AmR'))
 
 elif select_step == 'Step 5: Calculate the process limits':
     st.markdown("## Step 5: Calculate the process limits!")
@@ -611,63 +707,43 @@ elif select_step == 'Step 5: Calculate the process limits':
 
     st.markdown(
         """
-        Given a mean 1.11 and average moving range of 0.44 calculate the UPL and LPL. 
-        """
+        Given a mean {mean} and average moving range of {amr} calculate the UPL and LPL. 
+        """.format(**quiz_text)
     )
     colA, colB = st.columns(2)
     with colA:
         st.markdown("#### UPL")
-        UPL_Q1 = st.selectbox('What is the upper process limit (UPL)?',
-                              ('-',
-                              '0.82',
-                              '2.27',
-                              '0.98'))
-        if UPL_Q1 == '0.82':
-            st.markdown(":red[0.82 is the first moving range value not the UPL. Try again.]")
-        elif UPL_Q1 == '2.27':
-            st.markdown(":green[Correct! The UPL is 2.27. Great work!] 😄")
-        elif UPL_Q1 == '0.98':
-            st.markdown(":red[0.98 is in the dataset but not the UPL. Try again.]")
+        ask('UPL_Q1')
     with colB:    
         st.markdown("#### LPL")
-        LPL_Q1 = st.selectbox('What is the lower process limit (LPL)?',
-                                ('-',
-                                '1.1',
-                                '-0.06',
-                                '0'))
-        if LPL_Q1 == '1.1':
-            st.markdown(":red[1.1 is the AmR not the LPL. Try again.]")
-        elif LPL_Q1 == '-0.06':
-            st.markdown(":red[-0.06 is the calculated LPL however, in this instance, the LPL cannot be less than zero. This means the LPL defaults to what value?]")
-        elif LPL_Q1 == '0':
-            st.markdown(":green[Correct! 0 is the LPL because the value of a measured part, such is the case with the manufacturing dataset, cannot be less than zero. For this reason, the calculated value of -0.06 for the LPL defaults to zero. Great work!] 😄")
+        ask('LPL_Q1')
     st.markdown(" #### Check your work")
     with st.expander('Show UPL and LPL calculations and values'):
         colU, colL = st.columns(2)
         with colU:
             st.latex(r'''
-            UPL = 1.11 + (2.66*0.44)
-            ''')
+            UPL = %(mean)s + (2.66*%(amr)s)
+            ''' % quiz_text)
             st.latex(r'''
-            UPL = 1.11 + (1.17)
-            ''')
+            UPL = %(mean)s + (%(c1_amr)s)
+            ''' % quiz_text)
             st.latex(r'''
-            UPL = 2.27
-            ''')
+            UPL = %(upl)s
+            ''' % quiz_text)
         with colL:
             st.latex(r'''
-            LPL = 1.11 - (2.66*0.44)
-            ''')
+            LPL = %(mean)s - (2.66*%(amr)s)
+            ''' % quiz_text)
             st.latex(r'''
-            LPL = 1.11 - (1.17)
-            ''')
+            LPL = %(mean)s - (%(c1_amr)s)
+            ''' % quiz_text)
             st.latex(r'''
-            LPL = max(-0.06, 0)
-            ''')
+            LPL = max(%(lpl_calc)s, 0)
+            ''' % quiz_text)
 
             st.latex(r'''
-            LPL = 0
-            ''')
+            LPL = %(lpl)s
+            ''' % quiz_text)
 
     st.markdown("### Process limit for the mR-chart")
 
@@ -687,32 +763,22 @@ elif select_step == 'Step 5: Calculate the process limits':
 
     st.markdown(
         """
-        Given an average moving range of 1.1% calculate the upper range limit (URL). Using the above formula, the URL is calculated to be 3.6%. 
-        """
+        Given an average moving range of {amr} calculate the upper range limit (URL) using the above formula. 
+        """.format(**quiz_text)
     )
 
     st.markdown(" #### URL")
-    URL_Q1 = st.selectbox('What is the upper range limit?',
-                                ('-',
-                                '0.44',
-                                '1.11',
-                                '1.43'))
-    if URL_Q1 == '0.44':
-        st.markdown(":red[0.44 is the AmR not the URL. Try again.]")
-    elif URL_Q1 == '1.11':
-        st.markdown(":red[1.11 is the UPL not the URL. Try again.]")
-    elif URL_Q1 == '1.43':
-        st.markdown(":green[Correct! 1.43 is the URL. Great work!] 😄")
+    ask('URL_Q1')
     
     st.markdown(" ### Check your work")
     with st.expander("Show URL calculation and value"):
         st.latex(r'''
-        URL = 3.27*0.44
-        ''')
+        URL = 3.27*%s
+        ''' % quiz_text['amr'])
 
         st.latex(r'''
-        URL = 1.43
-        ''')
+        URL = %s
+        ''' % quiz_text['url'])
 
     st.markdown(
         """
@@ -724,7 +790,7 @@ elif select_step == 'Step 5: Calculate the process limits':
     # check your work expander 
     st.markdown(" ### The data")
     with st.expander("Show dataframe with process limits"):
-        st.dataframe(process_limit_df)
+        st.dataframe(lesson_frame('process_limit'))
 
 elif select_step == 'Step 6: Put it all together!':
     st.markdown("## Step 6: Put it all together!")
@@ -748,37 +814,9 @@ elif select_step == 'Step 6: Put it all together!':
         to calculate the upper and lower process limits in step 5. What conclusions, if any, can you make about the manufacturing process given this time series?
         """
     )
-    # Create plotly function for plotting data with mean
-    def plotly_plot(df,parameter,xtick_labels,xlabel='Observation',ylabel='Value',checkbox_arg='mean'):
-        # Create checkboc to control mean 
-        plot_mean = st.checkbox('Show '+checkbox_arg,value=True)
-        # Specify variables
-        data = df[parameter]
-        xlabels = df.index.tolist()
-        # Calculate basic statistics
-        mean = round(data.mean(),1)
-        # Create figure object and plot data
-        #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-        fig = px.line(df, x=xlabels, y=parameter,markers=True,
-                    labels={
-                        'x':xlabel,
-                        parameter:ylabel
-                    })
-        # Conditionally plot mean 
-        if plot_mean:
-            fig.add_hline(mean, line_dash='dash',line_color='black',
-                      annotation_text='Mean: ' + str(mean))
-        # Add centerline
-        #fig.add_hline(mean, line_dash='dash',line_color='black',
-        #              annotation_text='Mean: ' + str(mean))
-        # Specify annotations 
-        fig.update_annotations(font_size=18, font_color='black')
-        # Show fig in plotly
-        st.plotly_chart(fig,use_container_width=True)
-    
-    #st.markdown("### Time series of manufacturing data")
-    # Show individual values plot 
-    plotly_plot(df,'Value', df.index)
+    # Show individual values plot with the mean only
+    plot_mean = st.checkbox('Show mean',value=True)
+    plot_x_chart(show_mean=plot_mean, show_UPL=False, show_LPL=False, key='x_series')
     #st.caption('The X-chart starts its life as a time series of the individual values contained within the data set.')
     
     st.markdown("### Time series of moving range values")
@@ -795,29 +833,8 @@ elif select_step == 'Step 6: Put it all together!':
     #st.markdown("### Time series of moving range values")
     # Create checkbox to control average moving range 
     plot_AmR = st.checkbox('Show Average Moving Range (AmR)',value=True)
-
-    # Specify variables for mR-plot
-    data = mR_df['Moving range']
-    xlabels = df.index.tolist()
-    # Calculate basic statistics
-    AmR = round(data.mean(),1) # In this case calculate average moving range
-    # Create figure object and plot moving range values
-    #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-    fig = px.line(df,x=xlabels,y=data,markers=True,
-                labels={
-                    'x':'Observation',
-                    'y':'Moving Range'
-                })
-    # Conditionally plot average moving range 
-    if plot_AmR:
-        fig.add_hline(AmR, line_dash='dash',line_color='black',
-                    annotation_text='AmR: ' + str(AmR))
-    else:
-        print('')
-    # Specify annotations 
-    fig.update_annotations(font_size=18, font_color='black')
-    # Show fig in plotly
-    st.plotly_chart(fig)
+    # Show moving range plot with the average moving range only
+    plot_mr_chart(decimals=1, show_AmR=plot_AmR, show_URL=False, key='mr_series')
     st.caption('The mR-chart starts its life as a derived time series of moving range values.')
 
     st.markdown("### Building the PBC")
@@ -841,40 +858,8 @@ elif select_step == 'Step 6: Put it all together!':
     with colz:
         plot_LPL = st.checkbox('Show LPL',value=True)
 
-    # Create x-chart
-    # Specify variables
-    data = mR_df['Value']
-    xlabels = mR_df.index.tolist()
-    # Calculate basic statistics
-    mean = round(data.mean(),1)
-    AmR = round(mR_df['Moving range'].mean(),1)
-    # Calculate process limits
-    UPL = round(mean + (2.66*AmR),1)
-    LPL = round(mean - (2.66*AmR),1)
-    # Create figure object and plot data
-    #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-    fig = px.line(df, x=xlabels, y=data,markers=True,
-                labels={
-                    'x':'Observation',
-                    'y':'Value'
-                })
-    # Conditionally plot mean 
-    if plot_mean2:
-        fig.add_hline(mean, line_dash='dash',line_color='black',
-                    annotation_text='Mean: ' + str(mean))
-    if plot_UPL:
-        fig.add_hline(UPL, line_dash='dash',line_color='red',
-                    annotation_text='UPL: ' + str(UPL))
-    if plot_LPL:
-        fig.add_hline(LPL, line_dash='dash',line_color='red',
-                    annotation_text='LPL: ' + str(LPL))
-    # Add centerline
-    #fig.add_hline(mean, line_dash='dash',line_color='black',
-    #              annotation_text='Mean: ' + str(mean))
-    # Specify annotations 
-    fig.update_annotations(font_size=18, font_color='black')
-    # Show fig in plotly
-    st.plotly_chart(fig,use_container_width=True)
+    # Show x-chart
+    plot_x_chart(show_mean=plot_mean2, show_UPL=plot_UPL, show_LPL=plot_LPL)
     st.caption('With the addition of the UPL and LPL the X-chart is complete.')
 
     
@@ -887,37 +872,118 @@ elif select_step == 'Step 6: Put it all together!':
     with coly:
         plot_URL = st.checkbox('Show URL',value=True)
     
-    # Specify variables for mR-plot
-    data = mR_df['Moving range']
-    xlabels = df.index.tolist()
-    # Calculate basic statistics
-    AmR = round(data.mean(),2) # In this case calculate average moving range
-    URL = round(3.27*AmR,2)
-    # Create figure object and plot moving range values
-    #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-    fig = px.line(df,x=xlabels,y=data,markers=True,
-                labels={
-                    'x':'Observation',
-                    'y':'Moving Range'
-                })
-    # Conditionally plot average moving range 
-    if plot_AmR2:
-        fig.add_hline(AmR, line_dash='dash',line_color='black',
-                    annotation_text='AmR: ' + str(AmR))
-    if plot_URL:
-        fig.add_hline(URL, line_dash='dash',line_color='red',
-                    annotation_text='URL: ' + str(URL))
-
-    # Specify annotations 
-    fig.update_annotations(font_size=18, font_color='black')
-    # Show fig in plotly
-    st.plotly_chart(fig)
+    # Show mR-chart
+    plot_mr_chart(show_AmR=plot_AmR2, show_URL=plot_URL)
     st.caption('With the addition of the URL what was previously a derived time series is now an mR-chart.')
 
     # check your work expander 
     st.markdown(" ## Check your work")
     with st.expander("Show complete dataframe"):
-        st.dataframe(complete_df)
+        st.dataframe(lesson_frame('complete'))
+
+    # Phases
+    with st.expander("Has the process changed? Split the data into phases"):
+        st.markdown(
+            """
+            After a deliberate change to the process, such as new equipment or a new
+            procedure, the old limits no longer describe it. Pick the observations where
+            the process changed and each phase gets its own mean, AmR and limits.
+            """
+        )
+        with timings.stage('compute'):
+            suggested = memoize('breakpoints', df['Value'].to_numpy(),
+                                lambda values: suggest_breakpoints(xmr), key=data_key)
+        if len(suggested):
+            st.caption('Shifts detected in the data start at observations {}.'.format(
+                ', '.join(str(label) for label in df.index[suggested])))
+        use_suggested = st.checkbox('Start with the detected shifts', value=False,
+                                    disabled=not len(suggested))
+        phase_starts = st.multiselect('Start a new phase at observation', list(df.index[1:]),
+                                      default=list(df.index[suggested]) if use_suggested else [])
+        plot_phase_charts(df.index.get_indexer(phase_starts))
+
+    # Attribute charts
+    with st.expander("Counting defects? Try a p, np, c or u chart"):
+        st.markdown(
+            """
+            When the data are counts, such as defective parts per batch or scratches per panel,
+            attribute charts are an alternative to the X-chart. The p and np charts need the
+            number of defectives and the sample size of every batch, the u chart the number of
+            defects and the sample size, and the c chart only the number of defects. When the
+            sample size changes from batch to batch, so do the limits.
+            """
+        )
+        columns = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column])]
+        colx, coly, colz = st.columns(3)
+        with colx:
+            attribute_kind = st.selectbox('Chart ', ['p', 'np', 'c', 'u'],
+                                          format_func=lambda kind: kind + ' chart')
+        with coly:
+            count_column = st.selectbox('Count column', columns)
+        with colz:
+            # No sample sizes until a column other than the counts is picked
+            size_column = st.selectbox('Sample size column',
+                                       [None] + [column for column in columns
+                                                 if column != count_column],
+                                       format_func=lambda column: column or '-',
+                                       disabled=attribute_kind == 'c')
+        if attribute_kind != 'c' and size_column is None:
+            st.write('Pick the column holding the sample sizes.')
+        else:
+            try:
+                plot_attribute_chart(attribute_kind, count_column,
+                                     None if attribute_kind == 'c' else size_column)
+            except ValueError as error:
+                st.write(':red[{}]'.format(error))
+
+    # Robust limits
+    with st.expander("Noisy data? Try limits that resist outliers"):
+        st.markdown(
+            """
+            A single very large moving range inflates the AmR, which widens the limits and
+            can hide other signals. The median moving range is barely affected by it; its
+            limits use the scaling constants 3.145 (UPL and LPL) and 3.865 (URL).
+            Limits can also be calculated from a baseline without the points outside the
+            limits, recalculating until no points are left outside.
+            """
+        )
+        colx, coly = st.columns(2)
+        with colx:
+            robust_method = st.radio('Moving range', ['average', 'median'], index=1,
+                                     format_func={'average': 'Average (AmR)',
+                                                  'median': 'Median (MmR)'}.get)
+        with coly:
+            exclude_outliers = st.checkbox('Remove out-of-limit points and recalculate')
+        with timings.stage('compute'):
+            robust_xmr = cached_xmr(df['Value'], key=data_key, method=robust_method,
+                                    exclude_outliers=exclude_outliers)
+        robust_limits = robust_xmr.limits.rounded(2)
+        st.write('Mean: {}, {}: {}, UPL: {}, LPL: {}, URL: {}'.format(
+            robust_limits.mean, 'AmR' if robust_method == 'average' else 'MmR',
+            robust_limits.amr, robust_limits.upl, robust_limits.lpl, robust_limits.url))
+        robust_key = 'robust_{}_{}'.format(robust_method, exclude_outliers)
+        plot_x_chart(decimals=2, result=robust_xmr, key='x_chart_' + robust_key)
+        plot_mr_chart(decimals=2, result=robust_xmr, key='mr_chart_' + robust_key)
+
+    # Subgrouped charts
+    with st.expander("Data sampled in subgroups? Try an Xbar-R or Xbar-S chart"):
+        st.markdown(
+            """
+            When several measurements are taken together, e.g. 5 parts from every batch,
+            each subgroup is summarized by its average and its range (Xbar-R chart) or
+            standard deviation (Xbar-S chart). Here consecutive values are grouped together.
+            """
+        )
+        colx, coly = st.columns(2)
+        with colx:
+            subgroup_kind = st.selectbox('Chart', ['xbar_r', 'xbar_s'],
+                                         format_func={'xbar_r': 'Xbar-R', 'xbar_s': 'Xbar-S'}.get)
+        with coly:
+            subgroup_size = st.slider('Subgroup size', min_value=2, max_value=10, value=4)
+        if len(df) >= subgroup_size:
+            plot_subgroup_charts(subgroup_size, subgroup_kind)
+        else:
+            st.write('Not enough values for a subgroup of {}.'.format(subgroup_size))
     
 elif select_step == 'Interpreting the PBC':
     st.markdown("## Interpreting the PBC")
@@ -948,23 +1014,18 @@ elif select_step == 'Interpreting the PBC':
         """
     )
     
-    interpret_image_1 = Image.open(r'images\Interpreting PBC Flow Chart - Resource.png')
+    interpret_image_1 = load_image('Interpreting PBC Flow Chart - Resource.png')
     
     st.image(interpret_image_1, caption="Interpreting a PBC revolves around answering a single question: \
              is all the data in the process limits? Whether it does or it doesn't use this flow chart to guide your efforts.")
          
     # interpret_image_2 = Image.open('Interpreting PBC Flow Chart.png')
     
-# =============================================================================
-#     with open("images\Interpreting PBC Flow Chart.png", "rb") as file:
-# =============================================================================
-    with open("Interpreting PBC Flow Chart.png", "rb") as file:
-        
-        btn = st.download_button(
-            label='Download flowchart',
-            data=file,
-            file_name='Interpreting PBC flow chart.png',
-            mime='image/png')
+    btn = st.download_button(
+        label='Download flowchart',
+        data=load_image_bytes('Interpreting PBC Flow Chart.png'),
+        file_name='Interpreting PBC flow chart.png',
+        mime='image/png')
 
     st.markdown("### Start with characterization")
 
@@ -995,14 +1056,7 @@ elif select_step == 'Interpreting the PBC':
     
     st.markdown("### Your turn")
     
-    xchart_Q1 = st.selectbox('Given the criteria for characterization, what is the characterization of the manufacturing process based on the X-chart below?',
-                                ('-',
-                                'Predictable',
-                                'Unpredictable'))
-    if xchart_Q1 == 'Predictable':
-        st.markdown(":red[This process is not predictable. Think about the criteria that must be fullfilled for a process to be predictable and try again.]")
-    elif xchart_Q1 == 'Unpredictable':
-        st.markdown(":green[Correct! A process is characterized as unprdictable when one or more values fall outside the upper range limit (URL). Great work!] 😄")
+    ask('xchart_Q1')
         
     # Create columns for controls
     colx, coly, colz = st.columns(3)
@@ -1013,48 +1067,11 @@ elif select_step == 'Interpreting the PBC':
     with colz:
         plot_LPL = st.checkbox('Show LPL',value=False)
 
-    # Create x-chart
-    # Specify variables
-    data = mR_df['Value']
-    xlabels = mR_df.index.tolist()
-    # Calculate basic statistics
-    mean = round(data.mean(),1)
-    AmR = round(mR_df['Moving range'].mean(),1)
-    # Calculate process limits
-    UPL = round(mean + (2.66*AmR),1)
-    LPL = round(mean - (2.66*AmR),1)
-    # Create figure object and plot data
-    #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-    fig = px.line(df, x=xlabels, y=data,markers=True,
-                labels={
-                    'x':'Observation',
-                    'y':'Value'
-                })
-    # Conditionally plot mean 
-    if plot_mean2:
-        fig.add_hline(mean, line_dash='dash',line_color='black',
-                    annotation_text='Mean: ' + str(mean))
-    if plot_UPL:
-        fig.add_hline(UPL, line_dash='dash',line_color='red',
-                    annotation_text='UPL: ' + str(UPL))
-    if plot_LPL:
-        fig.add_hline(LPL, line_dash='dash',line_color='red',
-                    annotation_text='LPL: ' + str(LPL))
-    
-    # Specify annotations 
-    fig.update_annotations(font_size=18, font_color='black')
-    # Show fig in plotly
-    st.plotly_chart(fig,use_container_width=True)
+    # Show x-chart
+    plot_x_chart(show_mean=plot_mean2, show_UPL=plot_UPL, show_LPL=plot_LPL)
     st.caption('A process is characterized a predictable when all values fall within the process limits. Given this criteria, how is this process characterized?')
 
-    mRChart_Q1 = st.selectbox('Given the criteria for characterization, what is the characterization of the manufacturing process based on the mR-chart below?',
-                                ('-',
-                                'Predictable',
-                                'Unpredictable'))
-    if mRChart_Q1 == 'Predictable':
-        st.markdown(":red[That's not correct. What criteria must be fullfilled for a process to be predictable?]")
-    elif mRChart_Q1 == 'Unpredictable':
-        st.markdown(":green[Correct! A process is characterized as unprdictable when one or more values fall outside the process limits. Great work!] 😄")
+    ask('mRChart_Q1')
 
     colx, coly = st.columns(2)
     with colx:
@@ -1062,31 +1079,8 @@ elif select_step == 'Interpreting the PBC':
     with coly:
         plot_URL = st.checkbox('Show URL',value=False)
     
-    # Specify variables for mR-plot
-    data = mR_df['Moving range']
-    xlabels = df.index.tolist()
-    # Calculate basic statistics
-    AmR = round(data.mean(),2) # In this case calculate average moving range
-    URL = round(3.27*AmR,2)
-    # Create figure object and plot moving range values
-    #fig = px.line(df, x=xlabels, y=parameter,markers=True)
-    fig = px.line(df,x=xlabels,y=data,markers=True,
-                labels={
-                    'x':'Observation',
-                    'y':'Moving Range'
-                })
-    # Conditionally plot average moving range 
-    if plot_AmR2:
-        fig.add_hline(AmR, line_dash='dash',line_color='black',
-                    annotation_text='AmR: ' + str(AmR))
-    if plot_URL:
-        fig.add_hline(URL, line_dash='dash',line_color='red',
-                    annotation_text='URL: ' + str(URL))
-
-    # Specify annotations 
-    fig.update_annotations(font_size=18, font_color='black')
-    # Show fig in plotly
-    st.plotly_chart(fig)
+    # Show mR-chart
+    plot_mr_chart(show_AmR=plot_AmR2, show_URL=plot_URL)
     st.caption('With the addition of the URL what was previously a derived time series is now an mR-chart.')
 
     st.markdown("### Next steps")
@@ -1100,7 +1094,7 @@ elif select_step == 'Interpreting the PBC':
         process limits.
         """)
 
-    st.dataframe(special_cause_df)
+    st.dataframe(lesson_frame('complete', special_causes))
 
     url = "https://static1.squarespace.com/static/5b722db6f2e6b1ad5053391b/t/6412641ab8d87704ac358cfe/1678926874938/Interpretating+a+Process+Behavior+Chart+-+Jim+Lehner.pdf"
 
@@ -1138,3 +1132,32 @@ elif select_step == 'Interpreting the PBC':
 #         """
 #     )
 # =============================================================================
+
+# Report the cold start once the first run has rendered
+instrument.ready()
+
+# Debug panel with the timings of this rerun
+if debug:
+    with st.sidebar:
+        st.markdown("# Debug")
+        st.dataframe(pd.DataFrame(timings.rows(), columns=['Stage', 'ms', 'Calls']))
+        if timings.payloads:
+            st.dataframe(pd.DataFrame(list(timings.payloads.items()),
+                                      columns=['Chart', 'Payload bytes']))
+        st.write('Chart cache:', cache_stats()._asdict())
+        st.write('Summary store:', get_summary_store().stats())
+        # The caches are shared by every session of this process, so only
+        # whoever runs the server (PBC_DEBUG, not ?debug=1) may clear them
+        if instrument.debug_enabled() and st.button('Clear shared caches'):
+            chart_cache.clear()
+            clear_datasets()
+            st.cache_resource.clear()
+        if instrument.cold_start_time() is not None:
+            st.write('Cold start: %.3f s' % instrument.cold_start_time())
+        st.checkbox('Profile reruns', key='profile_rerun')
+        if profiler is not None:
+            report, profile_path = instrument.stop_profile(profiler)
+            st.download_button('Download profile', profile_path.read_bytes(),
+                               file_name=profile_path.name)
+            with st.expander('Profile of this rerun'):
+                st.text(report)
@@ -0,0 +1,55 @@
+"""Computation helpers for the Learn to build a PBC app.
+
+Nothing in this package imports streamlit, so the same code can be used
+outside of the app.
+"""
+from pbc.attribute import AttributeResult, attribute_signals, compute_attribute
+from pbc.batch import compute_batch
+from pbc.changepoint import suggest_breakpoints
+from pbc.data import (DatasetLoader, iter_value_chunks, load_dataset, load_datasets,
+                      read_values)
+from pbc.phases import Phase, PhaseIndex, phase_limits, phase_signals
+from pbc.quiz import QUESTIONS, AnswerKey, Question, answer_key, quiz_stats
+from pbc.rules import RULES, SignalReport, detect_signals, xmr_signals
+from pbc.store import Summary, SummaryStore, summarize
+from pbc.streaming import StreamingXmR, limits_from_chunks
+from pbc.subgroup import SubgroupLimits, SubgroupResult, compute_subgroups, subgroup_signals
+from pbc.xmr import XmRLimits, XmRResult, compute_xmr
+
+__all__ = [
+    'QUESTIONS',
+    'RULES',
+    'AnswerKey',
+    'AttributeResult',
+    'DatasetLoader',
+    'Phase',
+    'PhaseIndex',
+    'Question',
+    'SignalReport',
+    'StreamingXmR',
+    'Summary',
+    'SummaryStore',
+    'SubgroupLimits',
+    'SubgroupResult',
+    'XmRLimits',
+    'XmRResult',
+    'answer_key',
+    'attribute_signals',
+    'compute_attribute',
+    'compute_batch',
+    'compute_subgroups',
+    'compute_xmr',
+    'detect_signals',
+    'iter_value_chunks',
+    'limits_from_chunks',
+    'load_dataset',
+    'load_datasets',
+    'phase_limits',
+    'phase_signals',
+    'quiz_stats',
+    'read_values',
+    'subgroup_signals',
+    'suggest_breakpoints',
+    'summarize',
+    'xmr_signals',
+]
@@ -0,0 +1,5 @@
+import sys
+
+from pbc.cli import main
+
+sys.exit(main())
@@ -0,0 +1,114 @@
+"""Attribute charts: p, np, c and u charts for counts of defects or defectives.
+
+* p chart: proportion defective ``counts / sizes``,
+* np chart: number defective ``counts``,
+* c chart: number of defects per unit of constant size,
+* u chart: defects per unit ``counts / sizes``.
+
+When the sample size changes from point to point so do the limits. They are
+computed for every point at once with array arithmetic and returned as
+arrays, which :func:`pbc.rules.detect_signals` takes in place of scalars.
+LPLs below zero are floored at zero.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from pbc.rules import RULES, SignalReport, detect_signals
+
+KINDS = ('p', 'np', 'c', 'u')
+# Rules that make sense on an attribute chart; there is no moving range
+ATTRIBUTE_RULES = tuple(rule for rule in RULES if rule != 'mr_above_url')
+LABELS = {'p': 'Proportion defective', 'np': 'Number defective',
+          'c': 'Defects', 'u': 'Defects per unit'}
+
+
+class AttributeLimits(NamedTuple):
+    """Scalar summary of an attribute chart (the per-point limits are arrays)."""
+    kind: str
+    center: float
+
+
+class AttributeResult:
+    """Plotted statistic of an attribute chart with its per-point limits."""
+    __slots__ = ('kind', 'values', 'sizes', 'center', 'upl', 'lpl')
+
+    def __init__(self, kind: str, values: np.ndarray, sizes: np.ndarray,
+                 center: np.ndarray, upl: np.ndarray, lpl: np.ndarray):
+        self.kind = kind
+        self.values = values
+        self.sizes = sizes
+        self.center = center
+        self.upl = upl
+        self.lpl = lpl
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'AttributeResult(kind={!r}, n={}, center={})'.format(
+            self.kind, len(self), self.limits.center)
+
+    @property
+    def limits(self) -> AttributeLimits:
+        # The np chart's center moves with the sample size; report the average
+        return AttributeLimits(self.kind, float(np.mean(self.center)))
+
+    @property
+    def label(self) -> str:
+        return LABELS[self.kind]
+
+
+def compute_attribute(counts, sizes=None, kind: str = 'p') -> AttributeResult:
+    """Compute a p, np, c or u chart.
+
+    ``counts`` are the defectives (p, np) or defects (c, u) per sample and
+    ``sizes`` the sample sizes, a scalar or one per sample. The c chart
+    needs no sizes. Counts must be zero or more and sizes more than zero.
+    """
+    if kind not in KINDS:
+        raise ValueError('kind must be one of {}'.format(', '.join(KINDS)))
+    counts = np.asarray(counts, dtype=np.float64)
+    if counts.ndim != 1 or len(counts) == 0:
+        raise ValueError('compute_attribute needs a non-empty one dimensional series')
+    if kind == 'c':
+        sizes = np.ones_like(counts)
+    elif sizes is None:
+        raise ValueError('a {} chart needs the sample sizes'.format(kind))
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), counts.shape)
+    # Written so that NaNs fail the checks too
+    if not np.all(counts >= 0):
+        raise ValueError('counts must be zero or more')
+    if not np.all(sizes > 0):
+        raise ValueError('sample sizes must be more than zero')
+    if kind in ('p', 'np') and np.any(counts > sizes):
+        raise ValueError('counts of defectives cannot exceed the sample sizes')
+
+    rate = counts.sum() / sizes.sum()
+    if kind == 'p':
+        values = counts / sizes
+        center = np.full(counts.shape, rate)
+        sigma = np.sqrt(rate * (1 - rate) / sizes)
+    elif kind == 'np':
+        values = counts
+        center = sizes * rate
+        sigma = np.sqrt(sizes * rate * (1 - rate))
+    elif kind == 'c':
+        values = counts
+        center = np.full(counts.shape, rate)
+        sigma = np.full(counts.shape, np.sqrt(rate))
+    else:
+        values = counts / sizes
+        center = np.full(counts.shape, rate)
+        sigma = np.sqrt(rate / sizes)
+    upl = center + 3 * sigma
+    lpl = np.maximum(center - 3 * sigma, 0.0)
+    return AttributeResult(kind, values, sizes, center, upl, lpl)
+
+
+def attribute_signals(result: AttributeResult, rules=ATTRIBUTE_RULES) -> SignalReport:
+    """Evaluate ``rules`` against the per-point limits of an attribute chart."""
+    # Sigma is taken from the UPL, which is never floored
+    return detect_signals(result.values, result.center, result.upl, result.lpl,
+                          rules=rules)
+
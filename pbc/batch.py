@@ -0,0 +1,127 @@
+"""XmR limits and signals for many series at once.
+
+The input is a long format frame with one row per observation. All series
+are computed in a single grouped pass over sorted arrays: sums per series
+come from ``np.add.reduceat`` and the rules run once over the concatenated
+series, with windows that straddle two series masked out. Large inputs are
+split by series across a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from pbc.rules import RULE_WINDOWS, RULES, detect_signals
+from pbc.xmr import C1, C2
+
+# Use a process pool automatically above both of these sizes
+PARALLEL_MIN_SERIES = 1000
+PARALLEL_MIN_POINTS = 1_000_000
+
+SUMMARY_COLUMNS = ('n', 'mean', 'amr', 'upl', 'lpl', 'url')
+
+
+def _summarize_sorted(values: np.ndarray, starts: np.ndarray, rules,
+                      lpl_floor: Optional[float]) -> dict:
+    """Limits and signal counts of consecutive series in ``values``.
+
+    ``starts`` holds the position where each series begins.
+    """
+    counts = np.diff(np.append(starts, len(values)))
+    present = ~np.isnan(values)
+    n = np.add.reduceat(present.astype(np.int64), starts)
+
+    # Moving ranges; the first point of every series has none
+    moving_range = np.empty(len(values))
+    moving_range[0] = np.nan
+    moving_range[1:] = np.abs(np.diff(values))
+    moving_range[starts] = np.nan
+    mr_present = ~np.isnan(moving_range)
+    mr_n = np.add.reduceat(mr_present.astype(np.int64), starts)
+
+    # Series without (enough) values get NaN limits
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(present, values, 0.0), starts) / n
+        amr = np.add.reduceat(np.where(mr_present, moving_range, 0.0), starts) / mr_n
+
+    upl = mean + C1 * amr
+    lpl = mean - C1 * amr
+    if lpl_floor is not None:
+        lpl = np.maximum(lpl, lpl_floor)
+    url = C2 * amr
+
+    summary = {'n': n, 'mean': mean, 'amr': amr, 'upl': upl, 'lpl': lpl, 'url': url}
+    if not rules:
+        return summary
+
+    report = detect_signals(values, np.repeat(mean, counts), np.repeat(upl, counts),
+                            np.repeat(lpl, counts), moving_range,
+                            np.repeat(url, counts), rules)
+    # Position of every point within its own series
+    position = np.arange(len(values)) - np.repeat(starts, counts)
+    signals = np.zeros(len(values), dtype=bool)
+    for rule, mask in report.masks.items():
+        mask &= position >= RULE_WINDOWS[rule] - 1
+        summary[rule] = np.add.reduceat(mask.astype(np.int64), starts)
+        signals |= mask
+    summary['signals'] = np.add.reduceat(signals.astype(np.int64), starts)
+    return summary
+
+
+def _summarize_chunk(args):
+    values, starts, rules, lpl_floor = args
+    return _summarize_sorted(values, starts, rules, lpl_floor)
+
+
+def compute_batch(frame: pd.DataFrame, series: str = 'series_id',
+                  time: Optional[str] = 'timestamp', value: str = 'value',
+                  rules=RULES, lpl_floor: Optional[float] = None,
+                  processes: Optional[int] = None) -> pd.DataFrame:
+    """Compute XmR limits and signal counts for every series in ``frame``.
+
+    Rows are ordered by ``time`` within each series (row order is kept when
+    ``time`` is None). Returns one row per series with the limits, a count per
+    rule and the number of points with any signal.
+
+    ``processes`` sets the size of the process pool; by default one is used
+    only for large inputs. Pass 1 to stay in this process.
+    """
+    codes, labels = pd.factorize(frame[series], sort=True)
+    if time is None:
+        order = np.argsort(codes, kind='stable')
+    else:
+        order = np.lexsort((frame[time].to_numpy(), codes))
+    # Rows without a series id are dropped; factorize gives them code -1
+    order = order[codes[order] >= 0]
+    values = frame[value].to_numpy(dtype=np.float64)[order]
+    codes = codes[order]
+    if len(values) == 0:
+        return pd.DataFrame(columns=list(SUMMARY_COLUMNS), index=labels[:0])
+    starts = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.insert(starts, 0, 0)
+
+    if processes is None:
+        large = (len(starts) >= PARALLEL_MIN_SERIES and
+                 len(values) >= PARALLEL_MIN_POINTS)
+        processes = (os.cpu_count() or 1) if large else 1
+    processes = min(processes, len(starts))
+
+    if processes <= 1:
+        summary = _summarize_sorted(values, starts, tuple(rules), lpl_floor)
+    else:
+        # Split on series boundaries into chunks of roughly equal size
+        bounds = np.searchsorted(starts, np.linspace(0, len(values), processes + 1)[1:-1])
+        bounds = np.unique(np.concatenate(([0], bounds, [len(starts)])))
+        chunks = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            stop = starts[hi] if hi < len(starts) else len(values)
+            chunks.append((values[starts[lo]:stop], starts[lo:hi] - starts[lo],
+                           tuple(rules), lpl_floor))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_summarize_chunk, chunks))
+        summary = {key: np.concatenate([part[key] for part in parts])
+                   for key in parts[0]}
+
+    return pd.DataFrame(summary, index=pd.Index(labels, name=series))
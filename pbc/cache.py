@@ -0,0 +1,195 @@
+"""Memoization of chart computations keyed on the content of the data.
+
+Streamlit reruns the whole script on every interaction. Keying results on a
+hash of the values means a rerun only pays for hashing the data, and any
+copy of the same data (a reloaded csv, another session) hits the cache too.
+"""
+import concurrent.futures
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from pbc.xmr import compute_xmr
+
+
+def data_hash(values) -> str:
+    """Return a hex digest identifying the content of ``values``.
+
+    The index of a Series is part of it, since results computed from a
+    Series keep its index as the x labels of their charts.
+    """
+    array = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(array.shape).encode('ascii'))
+    digest.update(memoryview(array).cast('B'))
+    index = getattr(values, 'index', None)
+    if isinstance(index, pd.RangeIndex):
+        digest.update(repr((index.start, index.stop, index.step)).encode('ascii'))
+    elif index is not None:
+        digest.update(str(index.dtype).encode('ascii'))
+        digest.update(pd.util.hash_pandas_object(index).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+    nbytes: int = 0
+    maxbytes: Optional[int] = None
+
+
+def sizeof(value) -> int:
+    """Approximate memory held by ``value``: arrays, frames, figures and results."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    slots = getattr(type(value), '__slots__', None)
+    if slots:
+        return sys.getsizeof(value) + sum(sizeof(getattr(value, name, None))
+                                          for name in slots)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """A thread-safe least recently used cache with hit/miss counters.
+
+    Entries are evicted beyond ``maxsize`` items or, when ``maxbytes`` is
+    given, beyond that many bytes as measured by :func:`sizeof`. A value
+    larger than ``maxbytes`` on its own is returned but not kept.
+    """
+
+    def __init__(self, maxsize: int = 32, maxbytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self._discard(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._items[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while len(self._items) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._discard(next(iter(self._items)))
+
+    def _discard(self, key):
+        if key in self._items:
+            del self._items[key]
+            self.nbytes -= self._sizes.pop(key)
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """Return the cached value for ``key`` or store ``func(*args, **kwargs)``.
+
+        When several threads miss the same key at once only the first
+        computes it; the others wait for its result (or its exception).
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._pending[key] = concurrent.futures.Future()
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+        if not owner:
+            return pending.result()
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as error:
+            pending.set_exception(error)
+            raise
+        else:
+            self.put(key, value)
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, len(self._items), self.maxsize,
+                          self.nbytes, self.maxbytes)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide cache of chart computations, shared by every session. Bounded
+# by PBC_CACHE_ENTRIES entries and PBC_CACHE_MB megabytes.
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PBC_CACHE_ENTRIES', 256))
+DEFAULT_MAX_BYTES = int(float(os.environ.get('PBC_CACHE_MB', 256)) * 1024 ** 2)
+chart_cache = LRUCache(maxsize=DEFAULT_MAX_ENTRIES, maxbytes=DEFAULT_MAX_BYTES)
+
+
+def memoize(name: str, values, func, *args, key: Optional[str] = None, **kwargs):
+    """Compute ``func(values, *args, **kwargs)`` once per content of ``values``.
+
+    ``name`` separates different computations on the same data. Pass a
+    precomputed ``key`` (from :func:`data_hash`) to avoid hashing twice.
+    """
+    key = data_hash(values) if key is None else key
+    cache_key = (name, key, args, tuple(sorted(kwargs.items())))
+    return chart_cache.get_or_compute(cache_key, func, values, *args, **kwargs)
+
+
+def cached_xmr(values, lpl_floor: Optional[float] = None, key: Optional[str] = None,
+               method: str = 'average', exclude_outliers: bool = False):
+    """Memoized :func:`pbc.xmr.compute_xmr`."""
+    return memoize('xmr', values, compute_xmr, key=key, lpl_floor=lpl_floor,
+                   method=method, exclude_outliers=exclude_outliers)
+
+
+def cache_stats() -> CacheStats:
+    """Hit/miss counters of the chart computation cache."""
+    return chart_cache.stats()
@@ -0,0 +1,65 @@
+"""Suggest where the process shifted, as breakpoints for :mod:`pbc.phases`.
+
+Binary segmentation on the individual values: the split of a segment that
+most reduces the squared deviations from the segment means is kept when
+the reduction, in units of the process sigma, exceeds a penalty. Segments
+are split best-first until no split pays for itself.
+
+Every candidate split of a segment is scored at once from the prefix sums
+of :class:`pbc.phases.PhaseIndex`, so a segment costs one vectorized pass
+over its length and the whole search is O(n log k) for k breakpoints.
+Sigma comes from the XmR limits (a third of UPL - mean), so it is the same
+estimate the chart uses and is barely affected by the shifts themselves.
+"""
+import heapq
+from typing import Optional
+
+import numpy as np
+
+from pbc.phases import PhaseIndex
+from pbc.xmr import XmRResult
+
+# Minimum number of points in a phase, the length of the run-of-8 rule
+MIN_SIZE = 8
+
+
+def _best_split(index: PhaseIndex, start: int, stop: int, min_size: int):
+    if stop - start < 2 * min_size:
+        return None
+    split, gains = index.split_gains(start, stop, min_size)
+    best = int(np.argmax(gains))
+    return float(gains[best]), int(split[best])
+
+
+def suggest_breakpoints(result: XmRResult, penalty: Optional[float] = None,
+                        min_size: int = MIN_SIZE, max_breaks: Optional[int] = None,
+                        index: Optional[PhaseIndex] = None) -> np.ndarray:
+    """Positions where a new phase is suggested to start, in increasing order.
+
+    ``penalty`` is the reduction in squared deviations, in units of sigma
+    squared, that a split must reach; it defaults to ``3 * log(n)``. Pass a
+    prebuilt ``index`` to reuse its prefix sums.
+    """
+    n = len(result)
+    index = PhaseIndex(result) if index is None else index
+    limits = result.limits
+    sigma = (limits.upl - limits.mean) / 3
+    if n < 2 * min_size or not sigma > 0:
+        return np.empty(0, dtype=np.int64)
+    threshold = (3 * np.log(n) if penalty is None else penalty) * sigma ** 2
+
+    breaks = []
+    heap = []
+
+    def push(start, stop):
+        best = _best_split(index, start, stop, min_size)
+        if best is not None and best[0] > threshold:
+            heapq.heappush(heap, (-best[0], best[1], start, stop))
+
+    push(0, n)
+    while heap and (max_breaks is None or len(breaks) < max_breaks):
+        _, split, start, stop = heapq.heappop(heap)
+        breaks.append(split)
+        push(start, split)
+        push(split, stop)
+    return np.array(sorted(breaks), dtype=np.int64)
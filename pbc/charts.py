@@ -0,0 +1,258 @@
+"""Plotly figures for the PBC charts.
+
+Long series are decimated before the figure is built and drawn with WebGL
+traces, so the browser stays responsive with hundreds of thousands of points.
+
+Charts are built once per dataset and set of limits, with every limit line
+present, and cached as plain figure dicts. Toggling a line only changes the
+``visible`` flag of its shape and annotation (see :func:`with_visible`).
+"""
+from typing import Optional
+
+import numpy as np
+import plotly.graph_objects as go
+
+from pbc.attribute import AttributeLimits, AttributeResult
+from pbc.cache import chart_cache
+from pbc.decimate import MAX_POINTS, decimate
+from pbc.store import Summary
+from pbc.subgroup import SubgroupLimits, SubgroupResult
+from pbc.xmr import XmRLimits, XmRResult
+
+# Series longer than this (after decimation) are drawn with WebGL
+WEBGL_THRESHOLD = 2_000
+
+
+def line_figure(x, y, xlabel: str = 'Observation', ylabel: str = 'Value',
+                keep: Optional[np.ndarray] = None, max_points: Optional[int] = MAX_POINTS,
+                method: str = 'minmax') -> go.Figure:
+    """Line chart with markers of ``y`` against ``x``.
+
+    ``keep`` marks points (e.g. signals) that survive decimation. Pass
+    ``max_points=None`` to plot every point.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if max_points is not None and len(y) > max_points:
+        indices = decimate(y, max_points, keep, method)
+        x, y = x[indices], y[indices]
+
+    trace = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure(trace(x=x, y=y, mode='lines+markers', name=ylabel))
+    fig.update_layout(xaxis_title=xlabel, yaxis_title=ylabel)
+    return fig
+
+
+def build_chart(x, y, lines, xlabel: str = 'Observation', ylabel: str = 'Value',
+                keep: Optional[np.ndarray] = None,
+                max_points: Optional[int] = MAX_POINTS) -> dict:
+    """Line chart of ``y`` with horizontal limit lines, as a figure dict.
+
+    ``lines`` is a sequence of ``(name, value, color)``; each is drawn as a
+    dashed line annotated with its name and value.
+    """
+    fig = line_figure(x, y, xlabel, ylabel, keep=keep, max_points=max_points)
+    for name, value, color in lines:
+        _add_hline(fig, name, value, color)
+    fig.update_annotations(font_size=18, font_color='black')
+    return fig.to_dict()
+
+
+def _add_hline(fig: go.Figure, name: str, value: float, color: str):
+    fig.add_hline(value, line_dash='dash', line_color=color, name=name,
+                  annotation_text='{}: {}'.format(name, value),
+                  annotation_name=name)
+
+
+def build_variable_chart(x, y, lines, xlabel: str = 'Observation', ylabel: str = 'Value',
+                         keep: Optional[np.ndarray] = None) -> dict:
+    """Like :func:`build_chart`, but line values may be arrays with one value per point.
+
+    Constant lines are drawn as in :func:`build_chart`; lines that vary are
+    drawn as dashed steps, decimated together with ``y``.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    indices = slice(None)
+    if len(y) > MAX_POINTS:
+        indices = decimate(y, MAX_POINTS, keep)
+    x = x[indices]
+    fig = line_figure(x, y[indices], xlabel, ylabel, max_points=None)
+    trace = go.Scattergl if len(x) > WEBGL_THRESHOLD else go.Scatter
+    for name, value, color in lines:
+        value = np.asarray(value, dtype=np.float64)
+        if value.ndim == 0 or np.all(value == value.flat[0]):
+            _add_hline(fig, name, round(float(value.flat[0]), 4), color)
+            continue
+        fig.add_trace(trace(x=x, y=value[indices], mode='lines', name=name,
+                            line_shape='hvh', line_dash='dash', line_color=color,
+                            line_width=1))
+    fig.update_annotations(font_size=18, font_color='black')
+    return fig.to_dict()
+
+
+def build_phase_chart(x, y, phases, xlabel: str = 'Observation', ylabel: str = 'Value',
+                      keep: Optional[np.ndarray] = None) -> dict:
+    """Line chart of ``y`` with limit lines that step at each phase, as a figure dict.
+
+    ``phases`` is a sequence of ``(start, stop, lines)`` where ``lines`` are
+    ``(name, value, color)`` as in :func:`build_chart`. Each line runs from
+    the first point of its phase to the first point of the next one.
+    """
+    fig = line_figure(x, y, xlabel, ylabel, keep=keep)
+    x = np.asarray(x)
+    for start, stop, lines in phases:
+        x0, x1 = x[start], x[min(stop, len(x) - 1)]
+        for name, value, color in lines:
+            fig.add_shape(type='line', x0=x0, x1=x1, y0=value, y1=value, name=name,
+                          line_dash='dash', line_color=color)
+            fig.add_annotation(x=x0, y=value, text='{}: {}'.format(name, value), name=name,
+                               showarrow=False, xanchor='left', yanchor='bottom')
+    fig.update_annotations(font_size=18, font_color='black')
+    return fig.to_dict()
+
+
+def _x_labels(result: XmRResult):
+    return result.index if result.index is not None else np.arange(len(result))
+
+
+def x_chart(result: XmRResult, limits: XmRLimits,
+            keep: Optional[np.ndarray] = None) -> dict:
+    """Individual values chart with Mean, UPL and LPL lines."""
+    lines = [('Mean', limits.mean, 'black'),
+             ('UPL', limits.upl, 'red'),
+             ('LPL', limits.lpl, 'red')]
+    return build_chart(_x_labels(result), result.values, lines,
+                       'Observation', 'Value', keep)
+
+
+def mr_chart(result: XmRResult, limits: XmRLimits,
+             keep: Optional[np.ndarray] = None) -> dict:
+    """Moving range chart with AmR and URL lines."""
+    lines = [('AmR', limits.amr, 'black'),
+             ('URL', limits.url, 'red')]
+    return build_chart(_x_labels(result), result.moving_range, lines,
+                       'Observation', 'Moving Range', keep)
+
+
+def xbar_chart(result: SubgroupResult, limits: SubgroupLimits,
+               keep: Optional[np.ndarray] = None) -> dict:
+    """Subgroup averages chart with the grand average, UPL and LPL lines."""
+    lines = [('Mean', limits.mean, 'black'),
+             ('UPL', limits.upl, 'red'),
+             ('LPL', limits.lpl, 'red')]
+    return build_chart(np.arange(1, len(result) + 1), result.averages, lines,
+                       'Subgroup', 'Average', keep)
+
+
+def spread_chart(result: SubgroupResult, limits: SubgroupLimits,
+                 keep: Optional[np.ndarray] = None) -> dict:
+    """Subgroup range (or standard deviation) chart with its average and limits."""
+    lines = [('Average', limits.spread, 'black'),
+             ('URL', limits.url, 'red')]
+    if limits.lrl > 0:
+        lines.append(('LRL', limits.lrl, 'red'))
+    return build_chart(np.arange(1, len(result) + 1), result.spreads, lines,
+                       'Subgroup', result.spread_label, keep)
+
+
+def x_phase_chart(result: XmRResult, phases, keep: Optional[np.ndarray] = None) -> dict:
+    """Individual values chart with Mean, UPL and LPL per phase.
+
+    ``phases`` is a sequence of :class:`pbc.phases.Phase`.
+    """
+    steps = [(start, stop, [('Mean', limits.mean, 'black'),
+                            ('UPL', limits.upl, 'red'),
+                            ('LPL', limits.lpl, 'red')])
+             for start, stop, limits in phases]
+    return build_phase_chart(_x_labels(result), result.values, steps,
+                             'Observation', 'Value', keep)
+
+
+def mr_phase_chart(result: XmRResult, phases, keep: Optional[np.ndarray] = None) -> dict:
+    """Moving range chart with AmR and URL per phase."""
+    steps = [(start, stop, [('AmR', limits.amr, 'black'),
+                            ('URL', limits.url, 'red')])
+             for start, stop, limits in phases]
+    return build_phase_chart(_x_labels(result), result.moving_range, steps,
+                             'Observation', 'Moving Range', keep)
+
+
+def attribute_chart(result: AttributeResult, limits: AttributeLimits = None,
+                    keep: Optional[np.ndarray] = None) -> dict:
+    """p, np, c or u chart with its center line and per-point limits."""
+    lines = [('Mean', result.center, 'black'),
+             ('UPL', result.upl, 'red'),
+             ('LPL', result.lpl, 'red')]
+    return build_variable_chart(np.arange(1, len(result) + 1), result.values, lines,
+                                'Sample', result.label, keep)
+
+
+def summary_chart(kind: str, summary: Summary, labels=None,
+                  limits: Optional[XmRLimits] = None) -> dict:
+    """X ('x') or mR ('mr') chart from a stored :class:`pbc.store.Summary`.
+
+    The summary points are already decimated and are plotted as they are.
+    ``labels`` are the x labels of the full series, positions by default.
+    """
+    limits = summary.limits if limits is None else limits
+    x = summary.points if labels is None else np.asarray(labels)[summary.points]
+    if kind == 'x':
+        lines = [('Mean', limits.mean, 'black'),
+                 ('UPL', limits.upl, 'red'),
+                 ('LPL', limits.lpl, 'red')]
+        return build_chart(x, summary.values, lines, 'Observation', 'Value',
+                           max_points=None)
+    lines = [('AmR', limits.amr, 'black'),
+             ('URL', limits.url, 'red')]
+    return build_chart(x, summary.moving_range, lines, 'Observation', 'Moving Range',
+                       max_points=None)
+
+
+CHARTS = {'x': x_chart, 'mr': mr_chart, 'xbar': xbar_chart, 'spread': spread_chart,
+          'x_phases': x_phase_chart, 'mr_phases': mr_phase_chart,
+          'attribute': attribute_chart}
+
+
+def cached_chart(kind: str, result, limits, key: str,
+                 keep: Optional[np.ndarray] = None) -> dict:
+    """Return the ``kind`` chart, building it once per ``key`` and limits.
+
+    ``kind`` is 'x' or 'mr' for an :class:`XmRResult`, 'xbar' or 'spread'
+    for a :class:`pbc.subgroup.SubgroupResult`, and 'x_phases' or
+    'mr_phases' for an :class:`XmRResult` with a sequence of
+    :class:`pbc.phases.Phase` as ``limits``, and 'attribute' for a
+    :class:`pbc.attribute.AttributeResult` with its ``limits``.
+
+    ``key`` identifies the data and the x labels, normally
+    :func:`pbc.cache.data_hash` of the Series the result was computed from,
+    which covers its index. The returned dict is shared and must not be
+    modified.
+    """
+    return chart_cache.get_or_compute(('chart', kind, key, tuple(limits)),
+                                      CHARTS[kind], result, limits, keep)
+
+
+def cached_summary_chart(kind: str, summary: Summary, limits: XmRLimits, key,
+                         labels=None) -> dict:
+    """Memoized :func:`summary_chart`, once per ``key`` and limits.
+
+    ``key`` must identify the labels as well as the values.
+    """
+    return chart_cache.get_or_compute(('summary_chart', kind, key, tuple(limits)),
+                                      summary_chart, kind, summary, labels, limits)
+
+
+def with_visible(fig: dict, **visible: bool) -> dict:
+    """Copy of ``fig`` with the named limit lines shown or hidden.
+
+    Only the layout and the limit line traces are copied; the data of the
+    values trace is shared with ``fig``.
+    """
+    layout = dict(fig['layout'])
+    for item in ('shapes', 'annotations'):
+        layout[item] = [dict(part, visible=visible.get(part.get('name'), True))
+                        for part in layout.get(item, ())]
+    data = [dict(trace, visible=visible[trace['name']]) if trace.get('name') in visible
+            else trace for trace in fig['data']]
+    return {'data': data, 'layout': layout}
@@ -0,0 +1,273 @@
+"""Command line entry point for computing limits without Streamlit.
+
+    python -m pbc compute input.parquet --out limits.json
+    python -m pbc compute plant/*.csv --out limits.parquet --jobs 8
+
+Each input file is read with :func:`pbc.data.read_values`, its XmR limits
+and special cause signals are computed with the same code the app uses, and
+the results are written as a JSON list with one object per file (with
+signal indices), or as a Parquet/csv table with one row per file.
+
+    python -m pbc summarize plant/*.parquet --jobs 8
+
+fills the summary store (:mod:`pbc.store`) ahead of time, so the charts of
+those files open without computing anything.
+
+    python -m pbc quiz cohort/*.csv --out answers.csv
+
+writes the answer key of the lesson quizzes (:mod:`pbc.quiz`) of every
+file, for running the lessons on other datasets.
+
+A file that cannot be read or computed gets an entry with its ``error``
+next to the results of the others, and the exit status is then 1. Limits
+that do not exist (a file with fewer than two values) are written as null.
+"""
+import argparse
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from pbc.cache import data_hash
+from pbc.changepoint import suggest_breakpoints
+from pbc.data import iter_value_chunks, read_values
+from pbc.quiz import answer_key
+from pbc.rules import RULES, xmr_signals
+from pbc.store import DEFAULT_STORE, SummaryStore
+from pbc.streaming import limits_from_chunks
+from pbc.xmr import compute_xmr
+
+
+def compute_file(path: str, column: str = 'Value', lpl_floor: Optional[float] = None,
+                 chunksize: Optional[int] = None, method: str = 'average',
+                 exclude_outliers: bool = False, suggest_phases: bool = False) -> dict:
+    """Limits and signals of the ``column`` of one file, as a JSON-ready dict.
+
+    With ``chunksize`` the file is streamed and only the limits are computed;
+    this needs the default average moving range without outlier removal.
+    ``suggest_phases`` adds the positions where the process appears to shift.
+    """
+    if chunksize:
+        if method != 'average' or exclude_outliers or suggest_phases:
+            raise ValueError('chunked reading only computes average moving range limits')
+        limits = limits_from_chunks(iter_value_chunks(path, column, chunksize=chunksize),
+                                    lpl_floor)
+        return {'source': str(path), 'limits': limits._asdict()}
+
+    result = compute_xmr(read_values(path, column), lpl_floor, method, exclude_outliers)
+    report = xmr_signals(result)
+    output = {
+        'source': str(path),
+        'n': len(result),
+        'limits': result.limits._asdict(),
+        'signals': {rule: report.indices(rule).tolist() for rule in report.masks},
+    }
+    if suggest_phases:
+        output['breakpoints'] = suggest_breakpoints(result).tolist()
+    return output
+
+
+def _compute_file(args):
+    return compute_file(*args)
+
+
+def results_table(results) -> pd.DataFrame:
+    """One row per file with the limits and the number of signals per rule."""
+    rows = []
+    for result in results:
+        row = {'source': result['source'], 'n': result.get('n')}
+        row.update(result.get('limits', {}))
+        for rule in RULES:
+            indices = result.get('signals', {}).get(rule)
+            row[rule] = len(indices) if indices is not None else None
+        if 'breakpoints' in result:
+            row['breakpoints'] = ' '.join(str(b) for b in result['breakpoints'])
+        if 'error' in result:
+            row['error'] = result['error']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _json_ready(value):
+    # JSON has no NaN or infinity; such limits are written as null
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(item) for item in value]
+    return value
+
+
+def write_results(results, out: Optional[str]):
+    if out is None:
+        json.dump(_json_ready(results), sys.stdout, indent=2, allow_nan=False)
+        sys.stdout.write('\n')
+        return
+    path = Path(out)
+    suffix = path.suffix.lower()
+    if suffix in ('.parquet', '.pq'):
+        results_table(results).to_parquet(path, index=False)
+    elif suffix == '.csv':
+        results_table(results).to_csv(path, index=False)
+    else:
+        path.write_text(json.dumps(_json_ready(results), indent=2, allow_nan=False))
+
+
+def _run_task(args):
+    # The result of one task, or an error entry for the file it was given
+    func, task = args
+    try:
+        return func(task)
+    except Exception as error:
+        return {'source': str(task[0]), 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def run_tasks(func, tasks, jobs: Optional[int]) -> list:
+    """``func`` of every task, in worker processes unless there is one task or job.
+
+    A task that raises gives ``{'source': ..., 'error': ...}`` in its place.
+    """
+    tasks = [(func, task) for task in tasks]
+    if jobs == 1 or len(tasks) == 1:
+        return [_run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_run_task, tasks))
+
+
+def _status(results) -> int:
+    return 1 if any('error' in result for result in results) else 0
+
+
+def compute(args) -> int:
+    tasks = [(path, args.column, args.lpl_floor, args.chunksize, args.method,
+              args.exclude_outliers, args.suggest_phases) for path in args.inputs]
+    results = run_tasks(_compute_file, tasks, args.jobs)
+    write_results(results, args.out)
+    return _status(results)
+
+
+def summarize_file(path: str, store: str, column: str = 'Value',
+                   lpl_floor: Optional[float] = None, method: str = 'average') -> dict:
+    """Make sure the summary of one file is in the summary store at ``store``."""
+    values = read_values(path, column)
+    key = data_hash(values)
+    summary = SummaryStore(store).get_or_compute(values, key, lpl_floor, method)
+    return {'source': str(path), 'key': key, 'n': summary.n}
+
+
+def _summarize_file(args):
+    return summarize_file(*args)
+
+
+def summarize(args) -> int:
+    tasks = [(path, args.store, args.column, args.lpl_floor, args.method)
+             for path in args.inputs]
+    results = run_tasks(_summarize_file, tasks, args.jobs)
+    write_results(results, None)
+    return _status(results)
+
+
+def quiz_file(path: str, column: str = 'Value', decimals: int = 2,
+              lpl_floor: Optional[float] = 0.0) -> dict:
+    """Answer key of the lesson quizzes for the ``column`` of one file."""
+    values = read_values(path, column)
+    key = answer_key(values, decimals, lpl_floor)
+    return {
+        'source': str(path),
+        'key': data_hash(values),
+        'answers': key.answers(),
+        'choices': {question: [label for label, _, _ in choices]
+                    for question, choices in key.choices.items()},
+    }
+
+
+def _quiz_file(args):
+    return quiz_file(*args)
+
+
+def quiz(args) -> int:
+    tasks = [(path, args.column, args.decimals, args.lpl_floor) for path in args.inputs]
+    results = run_tasks(_quiz_file, tasks, args.jobs)
+    suffix = Path(args.out).suffix.lower() if args.out else ''
+    if suffix in ('.csv', '.parquet', '.pq'):
+        # One row per file with the right answer of every question
+        rows = []
+        for result in results:
+            row = {'source': result['source'], 'key': result.get('key')}
+            row.update(result.get('answers', {}))
+            if 'error' in result:
+                row['error'] = result['error']
+            rows.append(row)
+        table = pd.DataFrame(rows)
+        if suffix == '.csv':
+            table.to_csv(args.out, index=False)
+        else:
+            table.to_parquet(args.out, index=False)
+    else:
+        write_results(results, args.out)
+    return _status(results)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='pbc', description='Process Behavior Chart tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_compute = commands.add_parser(
+        'compute', help='compute XmR limits and signals of csv, Parquet or Arrow files')
+    parser_compute.add_argument('inputs', nargs='+', help='files to process')
+    parser_compute.add_argument('--out', help='output file (.json, .parquet or .csv); '
+                                              'JSON to stdout when omitted')
+    parser_compute.add_argument('--column', default='Value', help='column holding the values')
+    parser_compute.add_argument('--lpl-floor', type=float, default=None,
+                                help='lowest possible LPL, e.g. 0 for dimensions')
+    parser_compute.add_argument('--method', choices=('average', 'median'), default='average',
+                                help='base the limits on the average or median moving range')
+    parser_compute.add_argument('--exclude-outliers', action='store_true',
+                                help='recompute the limits without out-of-limit points')
+    parser_compute.add_argument('--suggest-phases', action='store_true',
+                                help='add the positions where the process appears to shift')
+    parser_compute.add_argument('--chunksize', type=int, default=None,
+                                help='stream files in chunks and compute limits only')
+    parser_compute.add_argument('--jobs', type=int, default=None,
+                                help='number of worker processes (default: all cores)')
+    parser_compute.set_defaults(func=compute)
+
+    parser_summarize = commands.add_parser(
+        'summarize', help='precompute chart summaries into the summary store')
+    parser_summarize.add_argument('inputs', nargs='+', help='files to process')
+    parser_summarize.add_argument('--store', default=str(DEFAULT_STORE),
+                                  help='SQLite file of the store (default: %(default)s)')
+    parser_summarize.add_argument('--column', default='Value', help='column holding the values')
+    parser_summarize.add_argument('--lpl-floor', type=float, default=None,
+                                  help='lowest possible LPL, e.g. 0 for dimensions')
+    parser_summarize.add_argument('--method', choices=('average', 'median'), default='average',
+                                  help='base the limits on the average or median moving range')
+    parser_summarize.add_argument('--jobs', type=int, default=None,
+                                  help='number of worker processes (default: all cores)')
+    parser_summarize.set_defaults(func=summarize)
+
+    parser_quiz = commands.add_parser(
+        'quiz', help='write the answer keys of the lesson quizzes for other datasets')
+    parser_quiz.add_argument('inputs', nargs='+', help='files to process')
+    parser_quiz.add_argument('--out', help='output file (.json, .parquet or .csv); '
+                                           'JSON to stdout when omitted')
+    parser_quiz.add_argument('--column', default='Value', help='column holding the values')
+    parser_quiz.add_argument('--decimals', type=int, default=2,
+                             help='decimals the answers are rounded to')
+    parser_quiz.add_argument('--lpl-floor', type=float, default=0.0,
+                             help='lowest possible LPL (default: %(default)s)')
+    parser_quiz.add_argument('--jobs', type=int, default=None,
+                             help='number of worker processes (default: all cores)')
+    parser_quiz.set_defaults(func=quiz)
+
+    args = parser.parse_args(argv)
+    if args.command == 'compute' and args.chunksize and (
+            args.method != 'average' or args.exclude_outliers or args.suggest_phases):
+        parser.error('--chunksize cannot be combined with --method median, '
+                     '--exclude-outliers or --suggest-phases')
+    return args.func(args)
@@ -0,0 +1,394 @@
+"""Loading datasets for the PBC app.
+
+Parsed frames are kept in memory between Streamlit reruns. Remote sources
+are revalidated with their ETag once the TTL runs out and a copy of the raw
+file is kept on disk so the app can still start without a network.
+
+Many remote sources are fetched concurrently by :meth:`DatasetLoader.load_many`
+(see :mod:`pbc.fetch`).
+
+Large local measurement files are read with :func:`read_values` and
+:func:`iter_value_chunks`, which only parse the value column with an
+explicit dtype and memory map Parquet and Arrow IPC files.
+"""
+import contextlib
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from pbc.fetch import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, HTTPStatusError, fetch_all
+
+# Seconds a parsed frame is served from memory before it is revalidated
+DEFAULT_TTL = 300
+# Parsed frames kept in memory; the least recently used go first
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PBC_DATASET_ENTRIES', 16))
+# Where raw copies of remote datasets are kept
+DEFAULT_CACHE_DIR = Path(os.environ.get('PBC_CACHE_DIR',
+                                        Path.home() / '.cache' / 'pbc'))
+
+
+@dataclass
+class _Entry:
+    frame: pd.DataFrame
+    # ETag of a remote source, or the mtime of a local file
+    validator: Optional[str]
+    checked: float
+
+
+def _is_remote(source: str) -> bool:
+    return urllib.parse.urlparse(source).scheme in ('http', 'https')
+
+
+def _local_path(source: str) -> Path:
+    parsed = urllib.parse.urlparse(source)
+    if parsed.scheme == 'file':
+        return Path(urllib.request.url2pathname(parsed.path))
+    return Path(source)
+
+
+class DatasetLoader:
+    """Load csv datasets from a URL, a ``file://`` URL or a local path.
+
+    Frames returned by :meth:`load` are shared between callers and should be
+    treated as read-only. At most ``max_entries`` frames are kept in memory.
+    Threads loading the same source at the same time share one download.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, cache_dir=DEFAULT_CACHE_DIR,
+                 timeout: float = 10, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def load(self, source: str, **read_kwargs) -> pd.DataFrame:
+        """Return the parsed dataset, refreshing it if the TTL has expired."""
+        key = (source, repr(sorted(read_kwargs.items())))
+        entry = self._lookup(key)
+        if self._is_fresh(entry):
+            return entry.frame
+
+        with self._loading_lock(key):
+            # Another thread may have refreshed it while we waited
+            entry = self._lookup(key)
+            if self._is_fresh(entry):
+                return entry.frame
+            if _is_remote(source):
+                entry = self._load_remote(source, entry, read_kwargs)
+            else:
+                entry = self._load_local(source, entry, read_kwargs)
+            self._store(key, entry)
+        return entry.frame
+
+    def clear(self):
+        """Forget every in-memory frame. The on-disk copies are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_fresh(self, entry: Optional[_Entry]) -> bool:
+        return entry is not None and time.monotonic() - entry.checked < self.ttl
+
+    def _loading_lock(self, key) -> threading.Lock:
+        # Held while a source is (re)loaded, so threads share one download
+        with self._lock:
+            return self._loading.setdefault(key, threading.Lock())
+
+    def _lookup(self, key) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_local(self, source, entry, read_kwargs) -> _Entry:
+        path = _local_path(source)
+        mtime = str(path.stat().st_mtime_ns)
+        if entry is not None and entry.validator == mtime:
+            return _Entry(entry.frame, mtime, time.monotonic())
+        frame = pd.read_csv(path, **read_kwargs)
+        return _Entry(frame, mtime, time.monotonic())
+
+    def _validator(self, source, entry) -> Optional[str]:
+        # ETag to revalidate with: the in-memory one, else the one saved on disk
+        if entry is not None:
+            return entry.validator
+        copy_path, etag_path = self._disk_paths(source)
+        if etag_path is not None and etag_path.exists() and copy_path.exists():
+            return etag_path.read_text().strip() or None
+        return None
+
+    def _not_modified(self, source, entry, validator, read_kwargs) -> _Entry:
+        if entry is not None:
+            return _Entry(entry.frame, validator, time.monotonic())
+        copy_path, _ = self._disk_paths(source)
+        frame = pd.read_csv(copy_path, **read_kwargs)
+        return _Entry(frame, validator, time.monotonic())
+
+    def _fresh(self, source, raw, etag, read_kwargs) -> _Entry:
+        frame = pd.read_csv(io.BytesIO(raw), **read_kwargs)
+        self._write_copy(*self._disk_paths(source), raw, etag)
+        return _Entry(frame, etag, time.monotonic())
+
+    def _load_remote(self, source, entry, read_kwargs) -> _Entry:
+        validator = self._validator(source, entry)
+        request = urllib.request.Request(source)
+        if validator:
+            request.add_header('If-None-Match', validator)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                raw = response.read()
+                etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as error:
+            if error.code != 304:
+                return self._fallback(source, entry, read_kwargs, error)
+            # Not modified, reuse what we already have
+            return self._not_modified(source, entry, validator, read_kwargs)
+        except (urllib.error.URLError, OSError) as error:
+            return self._fallback(source, entry, read_kwargs, error)
+        return self._fresh(source, raw, etag, read_kwargs)
+
+    def load_many(self, sources, return_exceptions: bool = False,
+                  concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                  **read_kwargs) -> list:
+        """Load several datasets, fetching the remote ones concurrently.
+
+        Frames are returned in the order of ``sources``. Fresh frames come
+        from memory as with :meth:`load`; all remote sources that need to be
+        (re)validated are requested at once with :func:`pbc.fetch.fetch_all`,
+        each with the loader's timeout, at most ``concurrency`` at a time and
+        at most ``per_host`` to any one host. A source that fails and has no
+        fallback raises, or with ``return_exceptions`` has its exception
+        returned in its place.
+
+        Like :meth:`load`, a source being loaded by another thread is waited
+        for rather than downloaded again.
+        """
+        read_key = repr(sorted(read_kwargs.items()))
+        results = [None] * len(sources)
+        # Positions of every source that is not fresh in memory
+        stale = {}
+        for i, source in enumerate(sources):
+            entry = self._lookup((source, read_key))
+            if self._is_fresh(entry):
+                results[i] = entry.frame
+            else:
+                stale.setdefault(source, []).append(i)
+        if not stale:
+            return results
+
+        with contextlib.ExitStack() as stack:
+            # Always taken in the same order, so two calls cannot deadlock
+            for source in sorted(stale):
+                stack.enter_context(self._loading_lock((source, read_key)))
+            pending = []
+            for source, positions in stale.items():
+                key = (source, read_key)
+                entry = self._lookup(key)
+                if self._is_fresh(entry):
+                    frame = entry.frame
+                elif _is_remote(source):
+                    pending.append((source, entry, self._validator(source, entry)))
+                    continue
+                else:
+                    frame = self._keep(key, return_exceptions, self._load_local,
+                                       source, entry, read_kwargs)
+                for i in positions:
+                    results[i] = frame
+
+            if pending:
+                responses = fetch_all([source for source, _, _ in pending],
+                                      [{'If-None-Match': v} if v else {}
+                                       for _, _, v in pending],
+                                      timeout=self.timeout, concurrency=concurrency,
+                                      per_host=per_host)
+                for (source, entry, validator), response in zip(pending, responses):
+                    frame = self._keep((source, read_key), return_exceptions,
+                                       self._from_response, source, entry, read_kwargs,
+                                       response, validator)
+                    for i in stale[source]:
+                        results[i] = frame
+        return results
+
+    def _from_response(self, source, entry, read_kwargs, response, validator) -> _Entry:
+        # Same handling as _load_remote, for a response (or error) of pbc.fetch
+        if isinstance(response, Exception):
+            return self._fallback(source, entry, read_kwargs, response)
+        if response.status == 304:
+            return self._not_modified(source, entry, validator, read_kwargs)
+        if not 200 <= response.status < 300:
+            return self._fallback(source, entry, read_kwargs,
+                                  HTTPStatusError(source, response.status))
+        return self._fresh(source, response.body, response.headers.get('etag'), read_kwargs)
+
+    def _keep(self, key, return_exceptions, load, *args):
+        # Run load(*args) and keep the entry, or hand back the error
+        try:
+            entry = load(*args)
+        except Exception as error:
+            if return_exceptions:
+                return error
+            raise
+        self._store(key, entry)
+        return entry.frame
+
+    def _fallback(self, source, entry, read_kwargs, error) -> _Entry:
+        # Serve a stale frame, then the on-disk copy, before giving up
+        if entry is not None:
+            return _Entry(entry.frame, entry.validator, time.monotonic())
+        copy_path, _ = self._disk_paths(source)
+        if copy_path is not None and copy_path.exists():
+            frame = pd.read_csv(copy_path, **read_kwargs)
+            return _Entry(frame, None, time.monotonic())
+        raise error
+
+    def _disk_paths(self, source):
+        if self.cache_dir is None:
+            return None, None
+        name = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        return (self.cache_dir / (name + '.csv'),
+                self.cache_dir / (name + '.etag'))
+
+    def _write_copy(self, copy_path, etag_path, raw, etag):
+        if copy_path is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent reader never sees half a file
+            tmp_path = copy_path.with_suffix('.tmp')
+            tmp_path.write_bytes(raw)
+            os.replace(tmp_path, copy_path)
+            etag_path.write_text(etag or '')
+        except OSError:
+            # A read-only disk only costs us the offline fallback
+            pass
+
+
+_default_loader = DatasetLoader()
+
+
+def load_dataset(source: str, **read_kwargs) -> pd.DataFrame:
+    """Load ``source`` through the process-wide :class:`DatasetLoader`.
+
+    Keyword arguments are passed on to ``pd.read_csv``.
+    """
+    return _default_loader.load(source, **read_kwargs)
+
+
+def clear_datasets():
+    """Forget the frames held by the process-wide loader."""
+    _default_loader.clear()
+
+
+def load_datasets(sources, return_exceptions: bool = False,
+                  concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+                  **read_kwargs) -> list:
+    """Load several sources concurrently through the process-wide loader."""
+    return _default_loader.load_many(sources, return_exceptions, concurrency, per_host,
+                                     **read_kwargs)
+
+
+# File suffixes of the columnar formats read through pyarrow
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as error:
+        raise ImportError('reading Parquet and Arrow files requires pyarrow') from error
+    return pyarrow
+
+
+def _file_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    return 'csv'
+
+
+def _to_array(column, dtype) -> np.ndarray:
+    # Arrow columns without nulls convert without a copy
+    if hasattr(column, 'to_numpy'):
+        array = column.to_numpy(zero_copy_only=False)
+    else:
+        array = np.asarray(column)
+    return array.astype(dtype, copy=False)
+
+
+def read_values(source, column: str = 'Value', dtype='float64') -> np.ndarray:
+    """Read a single column of a csv, Parquet or Arrow IPC file as an array.
+
+    Only ``column`` is parsed. Parquet and Arrow files are memory mapped;
+    an Arrow column without nulls that already has ``dtype`` is used
+    without a copy.
+    """
+    path = _local_path(str(source))
+    fmt = _file_format(path)
+    if fmt == 'csv':
+        frame = pd.read_csv(path, usecols=[column], dtype={column: dtype})
+        return frame[column].to_numpy()
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(path, columns=[column], memory_map=True)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return _to_array(table.column(column).combine_chunks(), dtype)
+
+
+def iter_value_chunks(source, column: str = 'Value', dtype='float64',
+                      chunksize: int = 1_000_000) -> Iterator[np.ndarray]:
+    """Yield ``column`` of a large file as arrays of at most ``chunksize`` values.
+
+    Memory use is bounded by the chunk size whatever the size of the file.
+    """
+    path = _local_path(str(source))
+    fmt = _file_format(path)
+    if fmt == 'csv':
+        reader = pd.read_csv(path, usecols=[column], dtype={column: dtype},
+                             chunksize=chunksize)
+        with reader:
+            for frame in reader:
+                yield frame[column].to_numpy()
+        return
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        parquet = pa.parquet.ParquetFile(path, memory_map=True)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=[column]):
+            yield _to_array(batch.column(0), dtype)
+        return
+    with pa.memory_map(str(path)) as source_file:
+        reader = pa.ipc.open_file(source_file)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).column(column)
+            for start in range(0, len(batch), chunksize):
+                yield _to_array(batch.slice(start, chunksize), dtype)
@@ -0,0 +1,84 @@
+"""Decimation of long series before they are sent to the browser.
+
+Both methods return the positions of the points to keep, so the caller can
+take the matching x labels. Points passed in ``keep`` (limit violations and
+other signals) are always part of the result.
+"""
+from typing import Optional
+
+import numpy as np
+
+# Series longer than this are decimated before plotting
+MAX_POINTS = 5_000
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Keep the smallest and largest point of ``n_out // 2`` equal buckets.
+
+    Fully vectorized: the series is reshaped into one row per bucket.
+    """
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(buckets, size)
+    # NaNs never win; a bucket that is all NaN falls back to its first point
+    low = np.argmin(np.where(np.isnan(rows), np.inf, rows), axis=1)
+    high = np.argmax(np.where(np.isnan(rows), -np.inf, rows), axis=1)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate((offsets + low, offsets + high, [0, n - 1]))
+    return np.unique(indices[indices < n])
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets selection of ``n_out`` points.
+
+    Preserves the visual shape of the line better than min-max at the cost
+    of a loop over buckets (not over points).
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_lo = edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) -
+                      (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[i + 1] = a
+    return np.unique(indices)
+
+
+def decimate(y, n_out: int, keep: Optional[np.ndarray] = None,
+             method: str = 'minmax') -> np.ndarray:
+    """Return sorted positions of about ``n_out`` points that represent ``y``.
+
+    ``keep`` is a boolean mask (or positions) of points that must be kept
+    exactly, e.g. the points flagged by :func:`pbc.rules.detect_signals`.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if method == 'minmax':
+        indices = minmax_indices(y, n_out)
+    elif method == 'lttb':
+        indices = lttb_indices(y, n_out)
+    else:
+        raise ValueError("method must be 'minmax' or 'lttb'")
+    if keep is not None:
+        keep = np.asarray(keep)
+        if keep.dtype == bool:
+            keep = np.flatnonzero(keep)
+        indices = np.union1d(indices, keep)
+    return indices
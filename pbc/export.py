@@ -0,0 +1,118 @@
+"""Exporting datasets for download.
+
+Each dataset is serialized once per format into a file under the temp
+directory, named after a hash of the frame, and reused afterwards by every
+rerun and session. CSV is written in chunks of rows so a large frame is never
+turned into one big string in memory. Excel is only offered for frames that
+fit on one sheet. The oldest exports are removed once the directory holds
+more than ``MAX_EXPORT_BYTES``.
+"""
+import hashlib
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# Rows written per chunk when exporting csv
+CHUNK_ROWS = 100_000
+EXPORT_DIR = Path(tempfile.gettempdir()) / 'pbc-exports'
+# Total size of the exports kept on disk; the least recently written go first
+MAX_EXPORT_BYTES = 1024 ** 3
+# Seconds after which a leftover temporary file of a failed write is removed
+STALE_TMP_SECONDS = 3600
+# Rows of an Excel sheet, the header row included
+EXCEL_MAX_ROWS = 1_048_576
+
+# Format name -> (label, file extension, mime type, modules that can write it)
+FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv', ()),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet',
+                ('pyarrow', 'fastparquet')),
+    'xlsx': ('Excel', '.xlsx',
+             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+             ('openpyxl', 'xlsxwriter')),
+}
+
+
+def available_formats(rows: Optional[int] = None):
+    """Formats that can be written with the installed packages.
+
+    With ``rows``, formats that cannot hold that many rows are left out.
+    """
+    return [name for name, (_, _, _, modules) in FORMATS.items()
+            if (not modules or any(importlib.util.find_spec(m) for m in modules))
+            and not (name == 'xlsx' and rows is not None and rows >= EXCEL_MAX_ROWS)]
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """Hex digest identifying the content, index and columns of ``df``."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _write(df: pd.DataFrame, fmt: str, path: Path):
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            for start in range(0, max(len(df), 1), CHUNK_ROWS):
+                df.iloc[start:start + CHUNK_ROWS].to_csv(file, header=start == 0)
+    elif fmt == 'parquet':
+        df.to_parquet(path)
+    elif fmt == 'xlsx':
+        if len(df) >= EXCEL_MAX_ROWS:
+            raise ValueError('{:,} rows do not fit on an Excel sheet'.format(len(df)))
+        df.to_excel(path)
+    else:
+        raise ValueError('unknown export format: {}'.format(fmt))
+
+
+def export_path(df: pd.DataFrame, fmt: str = 'csv', key: Optional[str] = None) -> Path:
+    """Path of ``df`` serialized as ``fmt``, writing it on first use.
+
+    ``key`` identifies the content of ``df``; it defaults to
+    :func:`frame_hash`.
+    """
+    key = frame_hash(df) if key is None else key
+    path = EXPORT_DIR / (key + FORMATS[fmt][1])
+    if not path.exists():
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees half a file
+        tmp_path = path.with_name('{}.{}-{}.tmp'.format(path.name, os.getpid(),
+                                                         threading.get_ident()))
+        try:
+            _write(df, fmt, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, path)
+        prune(keep=path)
+    return path
+
+
+def prune(max_bytes: int = MAX_EXPORT_BYTES, keep: Optional[Path] = None):
+    """Remove the oldest exports beyond ``max_bytes`` and stale temporary files."""
+    files = []
+    now = time.time()
+    for path in EXPORT_DIR.glob('*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.suffix == '.tmp':
+            if now - stat.st_mtime > STALE_TMP_SECONDS:
+                path.unlink(missing_ok=True)
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,288 @@
+"""Concurrent fetching of many remote datasets with asyncio.
+
+:func:`fetch_all` downloads a list of URLs at the same time, so loading
+many datasets takes about as long as the slowest one. It only uses the
+standard library: a small HTTP/1.1 client on top of ``asyncio`` streams
+that keeps connections alive and reuses them per host.
+
+* at most ``concurrency`` requests are in flight overall,
+* at most ``per_host`` connections are open to any one host,
+* every source has its own timeout, and a failing or slow source does not
+  hold up the others; its exception is returned in its place,
+* sources the environment sends through a proxy (``HTTP_PROXY``,
+  ``HTTPS_PROXY`` and ``NO_PROXY``) are fetched with :mod:`urllib` in a
+  worker thread, the way :meth:`pbc.data.DatasetLoader.load` fetches them.
+
+:meth:`pbc.data.DatasetLoader.load_many` builds on this with the same ETag
+revalidation and on-disk fallback as single loads.
+"""
+import asyncio
+import concurrent.futures
+import ssl
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Requests in flight at the same time
+DEFAULT_CONCURRENCY = 64
+# Open connections per host
+DEFAULT_PER_HOST = 32
+# Seconds allowed per source, including redirects
+DEFAULT_TIMEOUT = 10
+MAX_REDIRECTS = 5
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class Response(NamedTuple):
+    url: str
+    status: int
+    # Header names are lower case
+    headers: Dict[str, str]
+    body: bytes
+
+
+class HTTPStatusError(OSError):
+    """A response with an unexpected status code."""
+
+    def __init__(self, url: str, status: int):
+        super().__init__('HTTP {} for {}'.format(status, url))
+        self.url = url
+        self.status = status
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+async def _read_headers(reader) -> Dict[str, str]:
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def _read_chunked(reader) -> bytes:
+    parts = []
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        if size == 0:
+            await _read_headers(reader)  # trailers
+            return b''.join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+def _urlopen(url: str, headers: Dict[str, str], timeout: Optional[float],
+             proxies: Dict[str, str], ssl_context: Optional[ssl.SSLContext]) -> Response:
+    # A fresh opener, so the proxies are the ones the pool was created with
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler(proxies),
+                                         urllib.request.HTTPSHandler(context=ssl_context))
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            return Response(response.geturl(), response.status,
+                            {name.lower(): value for name, value in response.headers.items()},
+                            response.read())
+    except urllib.error.HTTPError as error:
+        # Non-2xx responses are returned, as by the pool's own client
+        return Response(url, error.code,
+                        {name.lower(): value for name, value in error.headers.items()},
+                        error.read())
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections, reused per ``(scheme, host, port)``."""
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.per_host = per_host
+        self.ssl_context = ssl_context
+        self._idle = {}
+        self._slots = {}
+        self._proxies = urllib.request.getproxies()
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+                  timeout: Optional[float] = None) -> Response:
+        """GET ``url``, following redirects.
+
+        ``timeout`` is shared by the request and its redirects. It only runs
+        while a connection slot is held, so time spent queueing behind other
+        requests to the host is free.
+        """
+        if self._proxied(url):
+            return await self._get_proxied(url, headers or {}, timeout)
+        for _ in range(MAX_REDIRECTS + 1):
+            response, elapsed = await self._request(url, headers or {}, timeout)
+            if timeout is not None:
+                timeout -= elapsed
+            location = response.headers.get('location')
+            if response.status not in _REDIRECTS or not location:
+                return response
+            url = urllib.parse.urljoin(url, location)
+        raise HTTPStatusError(url, response.status)
+
+    def _proxied(self, url: str) -> bool:
+        parts = urllib.parse.urlsplit(url)
+        return (parts.scheme in self._proxies and
+                not urllib.request.proxy_bypass(parts.hostname or ''))
+
+    async def _get_proxied(self, url: str, headers: Dict[str, str],
+                           timeout: Optional[float]) -> Response:
+        # urllib knows how to talk to proxies (CONNECT tunnels, credentials)
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        slot = self._slots.setdefault((parts.scheme, parts.hostname, port),
+                                      asyncio.Semaphore(self.per_host))
+        async with slot:
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(
+                loop.run_in_executor(None, _urlopen, url, headers, timeout,
+                                     self._proxies, self.ssl_context), timeout)
+
+    async def close(self):
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    async def _connect(self, scheme, host, port) -> _Connection:
+        context = None
+        if scheme == 'https':
+            if self.ssl_context is None:
+                self.ssl_context = ssl.create_default_context()
+            context = self.ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        return _Connection(reader, writer)
+
+    async def _request(self, url: str, headers: Dict[str, str],
+                       timeout: Optional[float]) -> Tuple[Response, float]:
+        # The response and the seconds it took once it had a slot
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError('unsupported URL scheme: {}'.format(url))
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        slot = self._slots.setdefault(key, asyncio.Semaphore(self.per_host))
+        async with slot:
+            if timeout is not None and timeout <= 0:
+                raise asyncio.TimeoutError()
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            response = await asyncio.wait_for(self._send(key, parts, headers), timeout)
+            elapsed = loop.time() - start
+        return response._replace(url=url), elapsed
+
+    async def _send(self, key, parts, headers: Dict[str, str]) -> Response:
+        idle = self._idle.setdefault(key, [])
+        # A pooled connection may have been closed by the server in the
+        # meantime; the request is then retried on another connection
+        while True:
+            reused = bool(idle)
+            connection = idle.pop() if reused else await self._connect(*key)
+            try:
+                response, keep_alive = await self._exchange(connection, parts, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                # Timeouts and cancellation leave the connection mid-response
+                connection.close()
+                raise
+            if keep_alive:
+                idle.append(connection)
+            else:
+                connection.close()
+            return response
+
+    async def _exchange(self, connection: _Connection, parts, headers):
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        lines = ['GET {} HTTP/1.1'.format(target),
+                 'Host: {}'.format(parts.netloc),
+                 'Connection: keep-alive',
+                 'Accept-Encoding: identity',
+                 'User-Agent: pbc']
+        lines += ['{}: {}'.format(name, value) for name, value in headers.items()]
+        connection.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await connection.writer.drain()
+
+        reader = connection.reader
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by the server')
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        status = int(status)
+        response_headers = await _read_headers(reader)
+
+        keep_alive = (version == 'HTTP/1.1'
+                      and response_headers.get('connection', '').lower() != 'close')
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await _read_chunked(reader)
+        elif 'content-length' in response_headers:
+            body = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return Response('', status, response_headers, body), keep_alive
+
+
+async def fetch_all_async(urls: Sequence[str], headers: Optional[Sequence[dict]] = None,
+                          timeout: Union[float, Sequence[float]] = DEFAULT_TIMEOUT,
+                          concurrency: int = DEFAULT_CONCURRENCY,
+                          per_host: int = DEFAULT_PER_HOST) -> List:
+    """Coroutine version of :func:`fetch_all`."""
+    headers = headers if headers is not None else [None] * len(urls)
+    timeouts = [timeout] * len(urls) if isinstance(timeout, (int, float)) else timeout
+    pool = ConnectionPool(per_host)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async def fetch(url, url_headers, url_timeout):
+        async with in_flight:
+            try:
+                return await pool.get(url, url_headers, url_timeout)
+            except asyncio.TimeoutError:
+                return TimeoutError('timed out after {}s: {}'.format(url_timeout, url))
+            except Exception as error:
+                return error
+
+    try:
+        return await asyncio.gather(*(fetch(*args) for args in zip(urls, headers, timeouts)))
+    finally:
+        await pool.close()
+
+
+def fetch_all(urls: Sequence[str], headers: Optional[Sequence[dict]] = None,
+              timeout: Union[float, Sequence[float]] = DEFAULT_TIMEOUT,
+              concurrency: int = DEFAULT_CONCURRENCY,
+              per_host: int = DEFAULT_PER_HOST) -> List:
+    """Fetch ``urls`` concurrently and return a :class:`Response` or exception per URL.
+
+    ``headers`` gives extra request headers per URL and ``timeout`` is a
+    number of seconds for every URL or a sequence with one per URL. Non-2xx
+    responses are returned as they are; redirects are followed.
+    """
+    coroutine = fetch_all_async(urls, headers, timeout, concurrency, per_host)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Called from inside an event loop (e.g. a notebook): run on a new one
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
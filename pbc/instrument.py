@@ -0,0 +1,160 @@
+"""Instrumentation hooks for the app.
+
+The cold start time is measured from the top of the first script run in a
+process to the end of that run, and reported once through the ``pbc``
+logger and any registered hooks.
+
+:class:`Timings` times the stages of a single rerun (load, compute, detect,
+figure build, chart payload). It is opt-in: a disabled instance hands out a
+shared no-op context manager, so leaving the calls in costs next to nothing.
+:func:`start_profile` and :func:`stop_profile` profile one rerun with
+pyinstrument when it is installed and cProfile otherwise.
+"""
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+logger = logging.getLogger('pbc.instrument')
+
+# Target for the first script run of a process, in seconds
+COLD_START_TARGET = float(os.environ.get('PBC_COLD_START_TARGET', 2.0))
+
+_started: Optional[float] = None
+_cold_start: Optional[float] = None
+_startup_hooks: List[Callable[[float, float], None]] = []
+
+
+def start(t0: Optional[float] = None):
+    """Mark the start of a script run; only the first call in a process counts."""
+    global _started
+    if _started is None:
+        _started = time.perf_counter() if t0 is None else t0
+
+
+def ready() -> Optional[float]:
+    """Mark the end of a script run and return the cold start time.
+
+    The first call after :func:`start` records the cold start, logs it
+    against ``COLD_START_TARGET`` and calls the startup hooks.
+    """
+    global _cold_start
+    if _cold_start is not None or _started is None:
+        return _cold_start
+    _cold_start = time.perf_counter() - _started
+    level = logging.WARNING if _cold_start > COLD_START_TARGET else logging.INFO
+    logger.log(level, 'cold start took %.3fs (target %.1fs)',
+               _cold_start, COLD_START_TARGET)
+    for hook in _startup_hooks:
+        hook(_cold_start, COLD_START_TARGET)
+    return _cold_start
+
+
+def cold_start_time() -> Optional[float]:
+    """Seconds taken by the first script run, once it has finished."""
+    return _cold_start
+
+
+def add_startup_hook(hook: Callable[[float, float], None]):
+    """Call ``hook(seconds, target)`` when the cold start has been measured."""
+    _startup_hooks.append(hook)
+    if _cold_start is not None:
+        hook(_cold_start, COLD_START_TARGET)
+
+
+def debug_enabled() -> bool:
+    """True when the PBC_DEBUG environment variable is set (and not 0)."""
+    return os.environ.get('PBC_DEBUG', '') not in ('', '0')
+
+
+_NOOP = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.record(self.name, time.perf_counter() - self.started)
+
+
+class Timings:
+    """Time spent per stage during one rerun.
+
+    Use ``with timings.stage('compute'):`` around each stage. Repeated
+    stages add up and are counted.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.seconds = {}
+        self.calls = {}
+        self.payloads = {}
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NOOP
+        return _Stage(self, name)
+
+    def record(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def payload(self, name: str, fig):
+        """Record the size in bytes of ``fig`` serialized the way Streamlit sends it."""
+        if not self.enabled:
+            return
+        import plotly.io as pio
+        with self.stage('serialize'):
+            self.payloads[name] = len(pio.to_json(fig).encode('utf-8'))
+
+    def rows(self):
+        """(stage, milliseconds, calls) for every stage, in the order they ran."""
+        return [(name, 1000 * seconds, self.calls[name])
+                for name, seconds in self.seconds.items()]
+
+
+def start_profile():
+    """Start profiling the current rerun."""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = Profiler()
+        profiler.start()
+    return profiler
+
+
+def stop_profile(profiler, directory=None):
+    """Stop ``profiler`` and save its output.
+
+    Returns a text report and the path of the saved file (a ``.prof`` for
+    cProfile, usable with snakeviz, or an ``.html`` page for pyinstrument).
+    """
+    directory = Path(directory or tempfile.gettempdir())
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = directory / 'pbc-rerun-{}.prof'.format(stamp)
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(30)
+        return text.getvalue(), path
+    profiler.stop()
+    path = directory / 'pbc-rerun-{}.html'.format(stamp)
+    path.write_text(profiler.output_html())
+    return profiler.output_text(), path
@@ -0,0 +1,111 @@
+"""XmR limits per phase of a series.
+
+A process that has been changed (a new machine, a new procedure) gets new
+limits from the change onwards. The series is split at breakpoints into
+phases, and each phase gets its own mean and AmR. Moving ranges that span
+two phases are left out of both.
+
+:class:`PhaseIndex` keeps prefix sums of the values and moving ranges, so
+the limits of any phase take two lookups each, however long the phase.
+Moving a breakpoint only recomputes the two phases next to it, without
+going over the data again.
+"""
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from pbc.rules import RULES, SignalReport, detect_signals
+from pbc.xmr import XmRLimits, XmRResult
+
+
+class Phase(NamedTuple):
+    """Positions ``start:stop`` of a phase and its limits."""
+    start: int
+    stop: int
+    limits: XmRLimits
+
+
+def _prefix(values: np.ndarray):
+    # Prefix sums of the values and of the number of values, NaNs counting as none
+    present = ~np.isnan(values)
+    sums = np.zeros(len(values) + 1)
+    np.cumsum(np.where(present, values, 0.0), out=sums[1:])
+    counts = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(present, out=counts[1:])
+    return sums, counts
+
+
+class PhaseIndex:
+    """Prefix sums of an XmR chart for O(1) limits of any range of points."""
+    __slots__ = ('n', '_sums', '_counts', '_mr_sums', '_mr_counts')
+
+    def __init__(self, result: XmRResult):
+        self.n = len(result)
+        self._sums, self._counts = _prefix(result.values)
+        # result.moving_range is NaN first, so moving range i sits at i + 1
+        self._mr_sums, self._mr_counts = _prefix(result.moving_range[1:])
+
+    def limits(self, start: int, stop: int,
+               lpl_floor: Optional[float] = None) -> XmRLimits:
+        """Limits of the points at positions ``start:stop``."""
+        count = self._counts[stop] - self._counts[start]
+        mean = (self._sums[stop] - self._sums[start]) / count if count else float('nan')
+        # Moving ranges between two points of the phase: start + 1 .. stop - 1
+        mr_stop = max(stop - 1, start)
+        mr_count = self._mr_counts[mr_stop] - self._mr_counts[start]
+        amr = ((self._mr_sums[mr_stop] - self._mr_sums[start]) / mr_count
+               if mr_count else float('nan'))
+        return XmRLimits.from_stats(float(mean), float(amr), lpl_floor)
+
+    def split_gains(self, start: int, stop: int, min_size: int = 1):
+        """Decrease in the sum of squared deviations from splitting ``start:stop``.
+
+        Returns the candidate breakpoints, leaving at least ``min_size``
+        points on either side, and the decrease for each, computed from the
+        prefix sums for all candidates at once.
+        """
+        split = np.arange(start + min_size, stop - min_size + 1)
+        sums, counts = self._sums, self._counts
+        left_sum = sums[split] - sums[start]
+        left_count = counts[split] - counts[start]
+        right_sum = sums[stop] - sums[split]
+        right_count = counts[stop] - counts[split]
+        total = counts[stop] - counts[start]
+        # Written with the difference of the two means, which keeps its
+        # precision when the values are far from zero
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gains = (left_count * right_count / total
+                     * (left_sum / left_count - right_sum / right_count) ** 2)
+        return split, np.nan_to_num(gains, nan=0.0)
+
+    def bounds(self, breakpoints: Sequence[int]) -> List[tuple]:
+        """``(start, stop)`` of every phase; a breakpoint is the first point of a phase."""
+        cuts = sorted({int(b) for b in breakpoints if 0 < b < self.n})
+        edges = [0] + cuts + [self.n]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def phases(self, breakpoints: Sequence[int] = (),
+               lpl_floor: Optional[float] = None) -> List[Phase]:
+        return [Phase(start, stop, self.limits(start, stop, lpl_floor))
+                for start, stop in self.bounds(breakpoints)]
+
+
+def phase_limits(result: XmRResult, breakpoints: Sequence[int] = (),
+                 lpl_floor: Optional[float] = None) -> List[Phase]:
+    """Split ``result`` at ``breakpoints`` (positions) and compute limits per phase."""
+    return PhaseIndex(result).phases(breakpoints, lpl_floor)
+
+
+def stepped(phases: Sequence[Phase], field: str) -> np.ndarray:
+    """Per-point array of one limit (e.g. 'upl'), constant within each phase."""
+    lengths = [phase.stop - phase.start for phase in phases]
+    return np.repeat([getattr(phase.limits, field) for phase in phases], lengths)
+
+
+def phase_signals(result: XmRResult, phases: Sequence[Phase],
+                  rules=RULES) -> SignalReport:
+    """Evaluate ``rules`` against the limits of the phase of each point."""
+    moving_range = result.moving_range if 'mr_above_url' in rules else None
+    return detect_signals(result.values, stepped(phases, 'mean'), stepped(phases, 'upl'),
+                          stepped(phases, 'lpl'), moving_range, stepped(phases, 'url'),
+                          rules)
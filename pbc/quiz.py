@@ -0,0 +1,395 @@
+"""Quiz questions of the lessons, with answers taken from the data.
+
+Every question is a row of :data:`QUESTIONS`: a prompt and its choices,
+each choice with the feedback shown when it is picked. Numeric choices are
+functions of the statistics returned by :func:`quiz_stats`, so the correct
+answer always matches the limits computed for the dataset in use, and the
+wrong answers are the mistakes the feedback talks about (the median instead
+of the mean, a zero-based count, a missing absolute value, ...).
+
+Feedback strings are formatted with the statistics and with ``{value}``,
+the label of the picked choice.
+
+Wrong answers of the table can coincide with the right one on some
+datasets (a mean that equals its median, an LPL of zero). Such choices are
+dropped and replaced with answers from the question's :data:`MISTAKES`
+(off-by-one counts, a signed moving range, a shifted decimal point, ...),
+so every question keeps its number of choices whatever the data.
+:func:`answer_key` builds all questions of a dataset at once; the app and
+``python -m pbc quiz`` cache or export it per dataset.
+"""
+from math import ceil
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from pbc.xmr import compute_xmr
+
+# Positions of the moving ranges asked about (1 = first moving range)
+MR_POSITIONS = (1, 5, 6, 10)
+
+
+class Choice(NamedTuple):
+    """A possible answer: a fixed label or a function of the statistics."""
+    value: Union[str, Callable[[dict], float]]
+    feedback: str
+    correct: bool = False
+
+
+class Mistake(NamedTuple):
+    """A common error, as the wrong values it gives for a correct value."""
+    values: Callable[[float], Tuple[float, ...]]
+    feedback: str
+
+
+MISTAKES: Dict[str, Mistake] = {
+    'off_by_one': Mistake(
+        lambda value: (value - 1, value + 1),
+        ":red[{value} is off by one. Count again and try again.]"),
+    'signed': Mistake(
+        lambda value: (-value,),
+        ":red[{value} is not correct. Remember moving range values are the absolute value "
+        "of the difference between subsequent values in a dataset. Try again.]"),
+    'decimal_shift': Mistake(
+        lambda value: (value * 10, value / 10),
+        ":red[This is close but the decimal is in the wrong place. Try again!]"),
+    'rounded': Mistake(
+        lambda value: (round(value) + (1 if round(value) == value else 0),),
+        ":red[{value} is not correct. Don't round until the end of the calculation. "
+        "Try again.]"),
+}
+
+
+class Question(NamedTuple):
+    prompt: str
+    choices: Tuple[Choice, ...]
+    # Decimals numeric choices are rounded to
+    decimals: int = 2
+    # Names of MISTAKES that replace wrong choices equal to the right one,
+    # most plausible first
+    mistakes: Tuple[str, ...] = ()
+    # Labels in the order they are shown, so the position of the right
+    # answer does not give it away
+    order: Tuple[str, ...] = ()
+
+
+def _at(values: np.ndarray, i: int) -> float:
+    return float(values[i]) if 0 <= i < len(values) else float('nan')
+
+
+def quiz_stats(values, decimals: int = 2, lpl_floor: Optional[float] = 0.0) -> dict:
+    """Statistics the quiz answers are derived from, rounded as in the lessons."""
+    result = compute_xmr(values)
+    values = result.values
+    abs_diff = np.abs(np.diff(values))
+    # Missing values and the moving ranges next to them are left out of the
+    # limits, so they are not counted either
+    present = values[~np.isnan(values)]
+    limits = result.limits.rounded(decimals)
+    lpl = max(limits.lpl, lpl_floor) if lpl_floor is not None else limits.lpl
+    beyond = int(np.sum((values > limits.upl) | (values < lpl)))
+    above_url = int(np.sum(abs_diff > limits.url))
+
+    stats = {
+        'n': len(present),
+        'n_mr': int(np.count_nonzero(~np.isnan(abs_diff))),
+        'sum': round(float(np.nansum(values)), decimals),
+        'mr_sum': round(float(np.nansum(abs_diff)), decimals),
+        'median': round(float(np.nanmedian(values)), decimals),
+        'mean': limits.mean,
+        'amr': limits.amr,
+        'upl': limits.upl,
+        'lpl_calc': limits.lpl,
+        'lpl': lpl,
+        'lpl_note': (' Because the values cannot be less than {floor}, the calculated value '
+                     'of {calc} defaults to {floor}.'.format(
+                         floor=format_value(lpl, decimals),
+                         calc=format_value(limits.lpl, decimals))
+                     if lpl != limits.lpl else ''),
+        'url': limits.url,
+        'c1_amr': round(limits.upl - limits.mean, decimals),
+        'first_value': _at(present, 0),
+        'last_value': _at(present, len(present) - 1),
+        'x_beyond': beyond,
+        'mr_above_url': above_url,
+        'x_characterization': 'Unpredictable' if beyond else 'Predictable',
+        'mr_characterization': 'Unpredictable' if above_url else 'Predictable',
+    }
+    for k in MR_POSITIONS:
+        stats['mr_{}'.format(k)] = round(_at(abs_diff, k - 1), decimals)
+        stats['mr_{}_from'.format(k)] = _at(values, k - 1)
+        stats['mr_{}_to'.format(k)] = _at(values, k)
+    return stats
+
+
+def format_value(value, decimals: int = 2) -> str:
+    """Label of a numeric answer, without trailing zeros (66.5, 60, 0)."""
+    if isinstance(value, str):
+        return value
+    text = '{:.{}f}'.format(round(float(value), decimals) + 0.0, decimals)
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def format_stats(stats: dict, decimals: int = 2) -> dict:
+    """``stats`` with the numbers formatted as answer labels, for use in text."""
+    return {name: format_value(stat, decimals) if isinstance(stat, float) else stat
+            for name, stat in stats.items()}
+
+
+def _other(characterization: str) -> str:
+    return 'Predictable' if characterization == 'Unpredictable' else 'Unpredictable'
+
+
+def question_choices(question: Question, stats: dict) -> List[Tuple[str, str, bool]]:
+    """``(label, feedback, correct)`` of every choice of ``question``.
+
+    A wrong answer that happens to have the same label as the right one (or
+    as an earlier wrong one) for this dataset is left out, and the gap is
+    filled with the question's mistakes applied to the right answer. The
+    choices of a question with an ``order`` come in that order.
+    """
+    formatted = format_stats(stats, question.decimals)
+    values = [choice.value(stats) if callable(choice.value) else choice.value
+              for choice in question.choices]
+    labels = [format_value(value, question.decimals) for value in values]
+    correct = {label for label, choice in zip(labels, question.choices) if choice.correct}
+    choices = []
+    seen = set()
+    for label, choice in zip(labels, question.choices):
+        if label in seen or (label in correct and not choice.correct):
+            continue
+        seen.add(label)
+        choices.append((label, choice.feedback.format(value=label, **formatted), choice.correct))
+
+    if question.order:
+        return sorted(choices, key=lambda choice: question.order.index(choice[0]))
+
+    answers = [value for value, choice in zip(values, question.choices)
+               if choice.correct and not isinstance(value, str) and np.isfinite(value)]
+    for name in question.mistakes:
+        mistake = MISTAKES[name]
+        for answer in answers:
+            for value in mistake.values(answer):
+                if len(choices) >= len(question.choices):
+                    return choices
+                label = format_value(value, question.decimals)
+                if label in seen:
+                    continue
+                seen.add(label)
+                choices.append((label, mistake.feedback.format(value=label, **formatted),
+                                False))
+    return choices
+
+
+QUESTIONS: Dict[str, Question] = {
+    # Step 2: the mean
+    'mean_numerator': Question(
+        "What is the sum of all the values in the 'Values' column in the above table?", (
+            Choice(lambda s: s['sum'] - s['last_value'],
+                   ":red[{value} is incorrect. Did you include the last value? Try again.]"),
+            Choice(lambda s: s['sum'] / 10,
+                   ":red[This is close but the decimal is in the wrong place. Try again!]"),
+            Choice(lambda s: ceil(s['sum'] + 0.5),
+                   ":red[{value} is a little high. Try your calculation one more time.]"),
+            Choice(lambda s: s['sum'],
+                   ":green[That's correct! The sum of all the values in the 'Values' column "
+                   "is {sum}. We will use this value as the numerator when we calculate "
+                   "the mean. Great work! 😄]", True),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+    'mean_denominator': Question(
+        'How many values are in the data set?', (
+            Choice('0', ":red[By definition of its existence this data set cannot have 0 "
+                        "values. Try again.]"),
+            Choice(lambda s: s['n'],
+                   ":green[That's correct! There are {n} values in the data set. When "
+                   "calculating the mean we will use {n} as the denominator.] 😄", True),
+            Choice(lambda s: s['n'] - 1,
+                   ":red[In Python, the initial element of a sequence is assigned the index 0. "
+                   "This is called zero-based numbering. While the table to the left starts at "
+                   "0, there are actually {n} values in the data set. Try again.]"),
+            Choice(lambda s: s['n'] // 4, ":red[{value} is not correct. Try again.]"),
+        ), decimals=0, mistakes=('off_by_one',)),
+    'mean_calc': Question(
+        'What is the mean of the values in the data set?', (
+            Choice(lambda s: s['median'],
+                   ":red[{value} is the median not the mean. Try again!]"),
+            Choice(lambda s: s['mean'],
+                   ":green[That's correct! The mean of the 'Value' column is {mean}. "
+                   "Great Work!] 😄", True),
+            Choice(lambda s: s['mean'] + 1,
+                   ":red[That's a little high. Check your calcualtion and try again.]"),
+            Choice(lambda s: s['mean'] - 0.1,
+                   ":red[Close but no cigar. Did you miss a decimal point?]"),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+
+    # Step 3: the moving ranges
+    'mR_Q1': Question(
+        'How do you calculate a moving range value?', (
+            Choice('Sum all of the values in the dataset',
+                   ":red[Summing all of the values in the dataset would simply be the sum of "
+                   "all the values in the dataset, not a moving range value. Try again.]"),
+            Choice('Find the difference between subsequent values in a dataset',
+                   ":red[Finding the difference between subsequent values is only part of "
+                   "calculating a moving range value]"),
+            Choice('Sum all of the values in a data set and divide by the number of values '
+                   'in the dataset',
+                   ":red[This is how you calculate the mean not a moving range value. "
+                   "Try again.]"),
+            Choice('Find the absolute value of the difference between subsequent values in '
+                   'a dataset',
+                   ":green[That's correct! Moving range values are calculated by finding the "
+                   "absolute value of the difference of subsequent values in a dataset. "
+                   "Great job!]", True),
+        )),
+    'mR_Q2': Question(
+        'What is the fifth moving range (mR)?', (
+            Choice(lambda s: s['mr_1'],
+                   ":red[{value} is one of the moving range values but not the fifth moving "
+                   "range value. Try again.]"),
+            Choice(lambda s: s['mr_5'],
+                   ":green[Correct! The absolute value of the difference between the fourth "
+                   "observation value ({mr_5_from}) and the fifth observation value "
+                   "({mr_5_to}) is {mr_5}. Great work!]", True),
+            Choice(lambda s: -s['mr_5'],
+                   ":red[{value} is not correct. Remember moving range values are the absolute "
+                   "value of the difference between subsequent values in a dataset. "
+                   "Try again.]"),
+            Choice(lambda s: s['mr_6'],
+                   ":red[{value} is one of the moving range values but not the fifth moving "
+                   "range value. Try again.]"),
+        ), mistakes=('signed', 'decimal_shift', 'rounded', 'off_by_one')),
+    'mR_Q3': Question(
+        'What is the tenth moving range (mR) value?', (
+            Choice(lambda s: -s['mr_10'],
+                   ":red[{value} is not correct. Remember moving range values are the absolute "
+                   "value of the difference between subsequent values in a dataset. "
+                   "Try again.]"),
+            Choice(lambda s: s['mr_1'],
+                   ":red[{value} is the first moving range value. Try again.]"),
+            Choice(lambda s: s['n'],
+                   ":red[{value} is the number of values in the dataset not one of the moving "
+                   "range values. Try again.]"),
+            Choice(lambda s: s['mr_10'],
+                   ":green[Correct! The absolute value of the difference between the ninth "
+                   "observation value ({mr_10_from}) and the tenth observation value "
+                   "({mr_10_to}) is {mr_10}. Great work!]", True),
+        ), mistakes=('signed', 'decimal_shift', 'rounded', 'off_by_one')),
+
+    # Step 4: the average moving range
+    'AmR_numerator': Question(
+        'What is the sum of all the moving range values?', (
+            Choice(lambda s: s['mr_sum'] + s['mr_1'], ":red[That's not correct. Try again.]"),
+            Choice(lambda s: round(s['mr_sum']), ":red[That's not correct. Try again.]"),
+            Choice(lambda s: s['mr_sum'],
+                   ":green[Correct! The sum of all the moving range values is {mr_sum}.]", True),
+            Choice(lambda s: s['mr_sum'] / 10, ":red[{value} is not correct. Try again.]"),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+    'AmR_denominator': Question(
+        'How many moving range values are in the dataset?', (
+            Choice(lambda s: s['n_mr'],
+                   ":green[Correct! There are {n_mr} moving range values in the datset.]", True),
+            Choice(lambda s: s['n'],
+                   ":red[{value} is too many moving range values. Try again.]"),
+            Choice(lambda s: s['n_mr'] - 1,
+                   ":red[{value} is too few moving range values. Try again.]"),
+            Choice(lambda s: s['n'] + 1,
+                   ":red[{value} is too many moving range values. Try again.]"),
+        ), decimals=0, mistakes=('off_by_one',)),
+    'AmR_calc': Question(
+        'What is the average moving range?', (
+            Choice(lambda s: s['n'],
+                   ":red[{value} is the number of values in the dataset not the average moving "
+                   "range. Try again.]"),
+            Choice(lambda s: s['mean'],
+                   ":red[{value} is the mean not the average moving range of the dataset. "
+                   "Try again.]"),
+            Choice(lambda s: s['amr'] * 10,
+                   ":red[{value} is not correct. Check your arithmatic and try again.]"),
+            Choice(lambda s: s['amr'],
+                   ":green[Correct! The average moving range for the dataset is {amr}.]", True),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+
+    # Step 5: the process limits
+    'UPL_Q1': Question(
+        'What is the upper process limit (UPL)?', (
+            Choice(lambda s: s['mr_1'],
+                   ":red[{value} is the first moving range value not the UPL. Try again.]"),
+            Choice(lambda s: s['upl'],
+                   ":green[Correct! The UPL is {upl}. Great work!] 😄", True),
+            Choice(lambda s: s['first_value'],
+                   ":red[{value} is in the dataset but not the UPL. Try again.]"),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+    'LPL_Q1': Question(
+        'What is the lower process limit (LPL)?', (
+            Choice(lambda s: s['mean'],
+                   ":red[{value} is the mean not the LPL. Try again.]"),
+            Choice(lambda s: s['lpl_calc'],
+                   ":red[{value} is the calculated LPL however, in this instance, the LPL "
+                   "cannot be less than {lpl}. This means the LPL defaults to what value?]"),
+            Choice(lambda s: s['lpl'],
+                   ":green[Correct! {lpl} is the LPL.{lpl_note} Great work!] 😄", True),
+        ), mistakes=('rounded', 'decimal_shift', 'off_by_one')),
+    'URL_Q1': Question(
+        'What is the upper range limit?', (
+            Choice(lambda s: s['amr'],
+                   ":red[{value} is the AmR not the URL. Try again.]"),
+            Choice(lambda s: s['mean'],
+                   ":red[{value} is the mean not the URL. Try again.]"),
+            Choice(lambda s: s['url'],
+                   ":green[Correct! {url} is the URL. Great work!] 😄", True),
+        ), mistakes=('decimal_shift', 'rounded', 'off_by_one')),
+
+    # Interpreting the PBC
+    'xchart_Q1': Question(
+        'Given the criteria for characterization, what is the characterization of the '
+        'manufacturing process based on the X-chart below?', (
+            Choice(lambda s: s['x_characterization'],
+                   ":green[Correct! A process is characterized as unpredictable when one or "
+                   "more values fall outside the process limits, and as predictable when all "
+                   "of them fall within. Great work!] 😄", True),
+            Choice(lambda s: _other(s['x_characterization']),
+                   ":red[That's not correct. Think about the criteria that must be fullfilled "
+                   "for a process to be predictable and try again.]"),
+        ), order=('Predictable', 'Unpredictable')),
+    'mRChart_Q1': Question(
+        'Given the criteria for characterization, what is the characterization of the '
+        'manufacturing process based on the mR-chart below?', (
+            Choice(lambda s: s['mr_characterization'],
+                   ":green[Correct! A process is characterized as unpredictable when one or "
+                   "more moving ranges fall above the upper range limit (URL), and as "
+                   "predictable when none do. Great work!] 😄", True),
+            Choice(lambda s: _other(s['mr_characterization']),
+                   ":red[That's not correct. What criteria must be fullfilled for a process "
+                   "to be predictable?]"),
+        ), order=('Predictable', 'Unpredictable')),
+}
+
+
+class AnswerKey(NamedTuple):
+    """The quiz of one dataset: its statistics and the choices of every question."""
+    stats: dict
+    # The statistics formatted as answer labels, for the lesson text
+    text: dict
+    # Question key -> (label, feedback, correct) per choice
+    choices: Dict[str, List[Tuple[str, str, bool]]]
+
+    def answers(self) -> Dict[str, str]:
+        """Label of the right answer of every question."""
+        return {key: next(label for label, _, correct in choices if correct)
+                for key, choices in self.choices.items()}
+
+
+def answer_key(values, decimals: int = 2, lpl_floor: Optional[float] = 0.0,
+               questions: Dict[str, Question] = QUESTIONS) -> AnswerKey:
+    """Build the answers and distractors of every question for ``values``.
+
+    A question whose answer does not exist for the dataset (the tenth moving
+    range of a series of eight values) is left out of the key.
+    """
+    stats = quiz_stats(values, decimals, lpl_floor)
+    choices = {}
+    for key, question in questions.items():
+        question_key = question_choices(question, stats)
+        if any(correct and label != 'nan' for label, _, correct in question_key):
+            choices[key] = question_key
+    return AnswerKey(stats, format_stats(stats, decimals), choices)
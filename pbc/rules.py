@@ -0,0 +1,128 @@
+"""Detection of special cause signals (Western Electric rules).
+
+Every rule is evaluated for all points at once with cumulative sums over
+boolean arrays, so there are no Python loops over the data. A rule marks the
+point that completes its pattern, e.g. the eighth point of a run of eight.
+
+The limits can be scalars or arrays with one value per point, so charts with
+limits that vary from point to point use the same rules.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+from pbc.xmr import XmRResult
+
+# Rules in the order they are usually checked
+RULES = (
+    'beyond_limits',   # a point outside the process limits
+    'run_of_8',        # 8 points in a row on the same side of the center line
+    'two_of_three',    # 2 of 3 points beyond two sigma on the same side
+    'four_of_five',    # 4 of 5 points beyond one sigma on the same side
+    'trend_of_6',      # 6 points in a row steadily increasing or decreasing
+    'mr_above_url',    # a moving range above the upper range limit
+)
+
+# Number of consecutive points each rule looks at
+RULE_WINDOWS = {
+    'beyond_limits': 1,
+    'run_of_8': 8,
+    'two_of_three': 3,
+    'four_of_five': 5,
+    'trend_of_6': 6,
+    'mr_above_url': 2,
+}
+
+
+class SignalReport:
+    """Boolean mask per rule, with the indices of the points that signal."""
+    __slots__ = ('masks',)
+
+    def __init__(self, masks: Dict[str, np.ndarray]):
+        self.masks = masks
+
+    def __repr__(self):
+        counts = ', '.join('{}={}'.format(rule, int(mask.sum()))
+                           for rule, mask in self.masks.items())
+        return 'SignalReport({})'.format(counts)
+
+    def any(self) -> np.ndarray:
+        """Mask of points flagged by at least one rule."""
+        masks = list(self.masks.values())
+        if not masks:
+            return np.zeros(0, dtype=bool)
+        return np.logical_or.reduce(masks)
+
+    def indices(self, rule: Optional[str] = None) -> np.ndarray:
+        """Positions flagged by ``rule``, or by any rule."""
+        mask = self.any() if rule is None else self.masks[rule]
+        return np.flatnonzero(mask)
+
+    def counts(self) -> Dict[str, int]:
+        return {rule: int(mask.sum()) for rule, mask in self.masks.items()}
+
+
+def _window_count(mask: np.ndarray, width: int) -> np.ndarray:
+    """Number of True values in the window of ``width`` points ending at each point.
+
+    Windows that would start before the first point count as zero.
+    """
+    counts = np.zeros(len(mask), dtype=np.int32)
+    if len(mask) < width:
+        return counts
+    total = np.cumsum(mask, dtype=np.int32)
+    counts[width - 1] = total[width - 1]
+    counts[width:] = total[width:] - total[:-width]
+    return counts
+
+
+def _same_side(above: np.ndarray, below: np.ndarray, needed: int, width: int):
+    return ((_window_count(above, width) >= needed) |
+            (_window_count(below, width) >= needed))
+
+
+def detect_signals(values, center, upl, lpl, moving_range=None, url=None,
+                   rules=RULES) -> SignalReport:
+    """Evaluate ``rules`` on ``values`` and return a :class:`SignalReport`.
+
+    Sigma is taken as a third of the distance from the center line to the
+    UPL. ``mr_above_url`` is only evaluated when ``moving_range`` and ``url``
+    are given.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    center = np.asarray(center, dtype=np.float64)
+    upl = np.asarray(upl, dtype=np.float64)
+    lpl = np.asarray(lpl, dtype=np.float64)
+    sigma = (upl - center) / 3
+    unknown = set(rules) - set(RULES)
+    if unknown:
+        raise ValueError('unknown rules: {}'.format(', '.join(sorted(unknown))))
+
+    masks = {}
+    if 'beyond_limits' in rules:
+        masks['beyond_limits'] = (values > upl) | (values < lpl)
+    if 'run_of_8' in rules:
+        masks['run_of_8'] = _same_side(values > center, values < center, 8, 8)
+    if 'two_of_three' in rules:
+        masks['two_of_three'] = _same_side(values > center + 2 * sigma,
+                                           values < center - 2 * sigma, 2, 3)
+    if 'four_of_five' in rules:
+        masks['four_of_five'] = _same_side(values > center + sigma,
+                                           values < center - sigma, 4, 5)
+    if 'trend_of_6' in rules:
+        # Six points in a trend are five differences with the same sign
+        step = np.diff(values)
+        trend = np.zeros(len(values), dtype=bool)
+        trend[1:] = _same_side(step > 0, step < 0, 5, 5)
+        masks['trend_of_6'] = trend
+    if 'mr_above_url' in rules and moving_range is not None and url is not None:
+        masks['mr_above_url'] = np.asarray(moving_range) > url
+    return SignalReport(masks)
+
+
+def xmr_signals(result: XmRResult, rules=RULES, limits=None) -> SignalReport:
+    """Evaluate ``rules`` on an XmR chart, optionally with other ``limits``."""
+    limits = result.limits if limits is None else limits
+    moving_range = result.moving_range if 'mr_above_url' in rules else None
+    return detect_signals(result.values, limits.mean, limits.upl, limits.lpl,
+                          moving_range, limits.url, rules)
@@ -0,0 +1,212 @@
+"""Persistent store of chart summaries, keyed by a hash of the data.
+
+A summary holds what is needed to show a chart without the raw data: the
+limits, the positions of the special cause signals per rule, and the
+decimated points of the X and mR charts. Summaries are kept in a SQLite
+file, so they survive restarts and are shared by every process on the
+machine; opening a chart whose data has been seen before is a primary key
+lookup instead of a recompute.
+
+Entries not read for ``max_age`` seconds are evicted, and the least
+recently read entries go first when the file grows beyond ``max_bytes``.
+When the file cannot be created or written (a read-only disk) the store
+does nothing and summaries are computed every time.
+"""
+import contextlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from pbc.cache import data_hash
+from pbc.data import DEFAULT_CACHE_DIR
+from pbc.decimate import MAX_POINTS, decimate
+from pbc.rules import RULES, xmr_signals
+from pbc.xmr import XmRLimits, compute_xmr
+
+DEFAULT_STORE = DEFAULT_CACHE_DIR / 'summaries.sqlite'
+# Entries not read for this many seconds are evicted
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+# Total size of the stored summaries before the least recently read are evicted
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    limits TEXT NOT NULL,
+    arrays BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_accessed ON summaries (accessed);
+"""
+
+
+class Summary(NamedTuple):
+    """Everything needed to draw the X and mR charts of a series."""
+    n: int
+    limits: XmRLimits
+    # Signal positions per rule
+    signals: dict
+    # Positions of the decimated points, and the values and moving ranges there
+    points: np.ndarray
+    values: np.ndarray
+    moving_range: np.ndarray
+
+    def signal_mask(self) -> np.ndarray:
+        """Boolean mask over the full series of points flagged by any rule."""
+        mask = np.zeros(self.n, dtype=bool)
+        for indices in self.signals.values():
+            mask[indices] = True
+        return mask
+
+
+def summarize(values, lpl_floor: Optional[float] = None, method: str = 'average',
+              rules=RULES, max_points: int = MAX_POINTS) -> Summary:
+    """Compute the :class:`Summary` of ``values``."""
+    result = compute_xmr(values, lpl_floor, method)
+    report = xmr_signals(result, rules)
+    points = decimate(result.values, max_points, keep=report.any())
+    return Summary(len(result), result.limits,
+                   {rule: report.indices(rule) for rule in report.masks},
+                   points, result.values[points], result.moving_range[points])
+
+
+def _pack(summary: Summary) -> bytes:
+    buffer = io.BytesIO()
+    arrays = {'signal_' + rule: indices for rule, indices in summary.signals.items()}
+    np.savez(buffer, points=summary.points, values=summary.values,
+             moving_range=summary.moving_range, **arrays)
+    return buffer.getvalue()
+
+
+def _unpack(n: int, limits: XmRLimits, blob: bytes) -> Summary:
+    with np.load(io.BytesIO(blob)) as arrays:
+        signals = {name[len('signal_'):]: arrays[name]
+                   for name in arrays.files if name.startswith('signal_')}
+        return Summary(n, limits, signals, arrays['points'], arrays['values'],
+                       arrays['moving_range'])
+
+
+class SummaryStore:
+    """SQLite backed store of :class:`Summary` objects.
+
+    Safe to use from several threads and processes; each call opens its own
+    short-lived connection. ``available`` is False when the file could not
+    be opened; the store is then always empty.
+    """
+
+    def __init__(self, path=DEFAULT_STORE, max_age: float = DEFAULT_MAX_AGE,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.executescript(_SCHEMA)
+            self.available = True
+        except (OSError, sqlite3.Error):
+            # A read-only disk only costs us the stored summaries
+            self.available = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key: str) -> Optional[Summary]:
+        row = None
+        if self.available:
+            try:
+                with self._connect() as db:
+                    row = db.execute('SELECT limits, arrays FROM summaries WHERE key = ?',
+                                     (key,)).fetchone()
+                    if row is not None:
+                        db.execute('UPDATE summaries SET accessed = ? WHERE key = ?',
+                                   (time.time(), key))
+            except (OSError, sqlite3.Error):
+                row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        stats = json.loads(row[0])
+        return _unpack(stats.pop('n'), XmRLimits(**stats), row[1])
+
+    def put(self, key: str, summary: Summary):
+        if not self.available:
+            return
+        blob = _pack(summary)
+        stats = dict(summary.limits._asdict(), n=summary.n)
+        now = time.time()
+        try:
+            with self._connect() as db:
+                db.execute('INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)',
+                           (key, now, now, len(blob), json.dumps(stats), blob))
+            self.evict()
+        except (OSError, sqlite3.Error):
+            # e.g. a full disk; the summary is simply not kept
+            pass
+
+    def get_or_compute(self, values, key: Optional[str] = None,
+                       lpl_floor: Optional[float] = None, method: str = 'average') -> Summary:
+        """Return the summary of ``values``, computing and storing it when missing.
+
+        ``key`` is :func:`pbc.cache.data_hash` of the values when it is
+        already known; the options are added to it.
+        """
+        key = '{}:{}:{}'.format(data_hash(values) if key is None else key, lpl_floor, method)
+        summary = self.get(key)
+        if summary is None:
+            summary = summarize(values, lpl_floor, method)
+            self.put(key, summary)
+        return summary
+
+    def evict(self):
+        """Drop entries older than ``max_age`` and trim the store to ``max_bytes``."""
+        if not self.available:
+            return
+        with self._connect() as db:
+            db.execute('DELETE FROM summaries WHERE accessed < ?',
+                       (time.time() - self.max_age,))
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM summaries').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Keep the most recently read entries that fit in max_bytes
+            db.execute("""
+                DELETE FROM summaries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS running
+                        FROM summaries)
+                    WHERE running > ?)""", (self.max_bytes,))
+
+    def stats(self) -> dict:
+        count = size = 0
+        if self.available:
+            with self._connect() as db:
+                count, size = db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count, 'bytes': size,
+                'available': self.available}
+
+    def clear(self):
+        if not self.available:
+            return
+        with self._connect() as db:
+            db.execute('DELETE FROM summaries')
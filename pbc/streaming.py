@@ -0,0 +1,202 @@
+"""Incremental XmR limits for data that arrives a point at a time.
+
+:class:`StreamingXmR` keeps running sums of the values and moving ranges so
+each new observation updates the limits in O(1), instead of recomputing the
+mean and AmR over the whole history.
+"""
+import math
+from collections import deque
+from typing import Iterable, Optional
+
+import numpy as np
+
+from pbc.xmr import XmRLimits, XmRResult
+
+
+class _GrowableArray:
+    """Float array with amortized O(1) appends."""
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty(capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, values: np.ndarray):
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)))
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    def view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+
+class StreamingXmR:
+    """Accumulate observations and keep XmR limits up to date.
+
+    By default the limits use every observation seen so far. With
+    ``baseline=N`` the limits are frozen once N observations have been
+    seen, which is the usual practice once a process has been
+    characterized. With ``window=W`` the limits use only the last W
+    observations. Missing values (NaN) are treated as in
+    :func:`pbc.xmr.compute_xmr`: they are kept in the values but left out
+    of the mean, and the moving ranges on either side of them are left
+    out of the AmR, also when the gap falls between two batches. Only
+    non-missing observations count towards ``baseline`` and ``window``.
+    """
+
+    def __init__(self, baseline: Optional[int] = None, window: Optional[int] = None,
+                 lpl_floor: Optional[float] = None, keep_values: bool = True):
+        if baseline is not None and window is not None:
+            raise ValueError('use either baseline or window, not both')
+        if baseline is not None and baseline < 2:
+            raise ValueError('baseline needs at least 2 observations')
+        if window is not None and window < 2:
+            raise ValueError('window needs at least 2 observations')
+        self.baseline = baseline
+        self.window = window
+        self.lpl_floor = lpl_floor
+        self.count = 0
+        self._sum = 0.0
+        self._mr_sum = 0.0
+        self._mr_count = 0
+        self._last = None
+        self._frozen = None
+        self._values = _GrowableArray() if keep_values else None
+        if window is not None:
+            self._window_values = deque()
+            self._window_mrs = deque()
+            self._since_resum = 0
+
+    @property
+    def frozen(self) -> bool:
+        """True once the baseline period is complete."""
+        return self._frozen is not None
+
+    def update(self, value: float):
+        """Add a single observation."""
+        value = float(value)
+        if self._values is not None:
+            self._values.extend(np.array([value]))
+        if math.isnan(value):
+            # No moving range to or from a missing value
+            self._last = None
+            return
+        self.count += 1
+        if self._frozen is not None:
+            self._last = value
+            return
+
+        mr = abs(value - self._last) if self._last is not None else None
+        self._last = value
+        self._sum += value
+        if mr is not None:
+            self._mr_sum += mr
+            self._mr_count += 1
+
+        if self.window is not None:
+            self._slide(value, mr)
+        elif self.baseline is not None and self.count == self.baseline:
+            self._frozen = self._compute_limits()
+
+    def extend(self, values):
+        """Add a batch of observations."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        if self.window is not None:
+            for value in values:
+                self.update(value)
+            return
+
+        # Split the batch where the baseline fills up; the rest is only stored
+        present = ~np.isnan(values)
+        accumulate = values
+        if self._frozen is not None:
+            accumulate = values[:0]
+        elif self.baseline is not None:
+            needed = self.baseline - self.count
+            accumulate = values[:int(np.searchsorted(np.cumsum(present), needed)) + 1]
+
+        if len(accumulate):
+            # The moving range from the previous batch is NaN after a gap
+            previous = self._last if self._last is not None else np.nan
+            mrs = np.abs(np.diff(accumulate, prepend=previous))
+            mrs = mrs[~np.isnan(mrs)]
+            self._sum += float(np.nansum(accumulate))
+            self._mr_sum += float(mrs.sum())
+            self._mr_count += len(mrs)
+            self.count += int(present[:len(accumulate)].sum())
+            if self.count == self.baseline:
+                self._frozen = self._compute_limits()
+
+        if self._values is not None:
+            self._values.extend(values)
+        self.count += int(present[len(accumulate):].sum())
+        self._last = float(values[-1]) if present[-1] else None
+
+    @property
+    def limits(self) -> XmRLimits:
+        """Current limits, or the frozen baseline limits."""
+        if self._frozen is not None:
+            return self._frozen
+        return self._compute_limits()
+
+    def values(self) -> np.ndarray:
+        """All observations seen so far, missing ones included (a read-only view)."""
+        if self._values is None:
+            raise ValueError('values are not kept; use keep_values=True')
+        view = self._values.view()
+        view.flags.writeable = False
+        return view
+
+    def result(self) -> XmRResult:
+        """Current values and limits, ready for the Step 6 charts."""
+        return XmRResult(self.values(), self.limits)
+
+    def _compute_limits(self) -> XmRLimits:
+        n = len(self._window_values) if self.window is not None else self.count
+        mean = self._sum / n if n else float('nan')
+        amr = self._mr_sum / self._mr_count if self._mr_count else float('nan')
+        return XmRLimits.from_stats(mean, amr, self.lpl_floor)
+
+    def _slide(self, value, mr):
+        # Every value in the window has the moving range to its predecessor,
+        # NaN when there is none (the first value or one after a gap)
+        self._window_values.append(value)
+        self._window_mrs.append(mr if mr is not None else math.nan)
+        if len(self._window_values) > self.window:
+            self._sum -= self._window_values.popleft()
+            self._window_mrs.popleft()
+            # The moving range between the dropped point and its successor
+            dropped = self._window_mrs[0]
+            if not math.isnan(dropped):
+                self._mr_sum -= dropped
+                self._mr_count -= 1
+                self._window_mrs[0] = math.nan
+        # Re-add the sums now and then so floating point error cannot build up
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            self._sum = sum(self._window_values)
+            self._mr_sum = math.fsum(mr for mr in self._window_mrs if not math.isnan(mr))
+            self._since_resum = 0
+
+
+def limits_from_chunks(chunks: Iterable[np.ndarray],
+                       lpl_floor: Optional[float] = None) -> XmRLimits:
+    """XmR limits of a series that arrives in chunks, e.g. from
+    :func:`pbc.data.iter_value_chunks`, without keeping the values.
+
+    Missing values are handled as in :func:`pbc.xmr.compute_xmr`: the
+    moving ranges next to a gap are left out, also across chunk boundaries,
+    so the limits match those of the whole series.
+    """
+    accumulator = StreamingXmR(lpl_floor=lpl_floor, keep_values=False)
+    for chunk in chunks:
+        accumulator.extend(chunk)
+    return accumulator.limits
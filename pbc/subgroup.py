@@ -0,0 +1,136 @@
+"""Average and range (Xbar-R) and average and standard deviation (Xbar-S) charts.
+
+Values are split into consecutive subgroups of ``n`` with a single reshape,
+and the subgroup averages, ranges and standard deviations are reductions
+along one axis of that array. The scaling constants come from a table
+indexed by subgroup size.
+"""
+from math import lgamma
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from pbc.rules import RULES, SignalReport, detect_signals
+
+# Subgroup sizes covered by the constants table
+SUBGROUP_SIZES = np.arange(2, 26)
+# Bias correction for the average range (expected range of n standard normals)
+D2 = np.array([1.1284, 1.6926, 2.0588, 2.3259, 2.5344, 2.7044, 2.8472, 2.9700,
+               3.0775, 3.1729, 3.2585, 3.3360, 3.4068, 3.4718, 3.5320, 3.5879,
+               3.6401, 3.6890, 3.7350, 3.7783, 3.8194, 3.8583, 3.8953, 3.9306])
+# Standard deviation of the range of n standard normals
+D3_SIGMA = np.array([0.8525, 0.8884, 0.8798, 0.8641, 0.8480, 0.8332, 0.8198, 0.8078,
+                     0.7971, 0.7873, 0.7785, 0.7704, 0.7630, 0.7562, 0.7499, 0.7441,
+                     0.7386, 0.7335, 0.7287, 0.7242, 0.7199, 0.7159, 0.7121, 0.7084])
+
+
+def _c4(n):
+    # Bias correction for the subgroup standard deviation
+    return np.array([np.sqrt(2 / (k - 1)) * np.exp(lgamma(k / 2) - lgamma((k - 1) / 2))
+                     for k in np.atleast_1d(n)])
+
+
+C4 = _c4(SUBGROUP_SIZES)
+A2 = 3 / (D2 * np.sqrt(SUBGROUP_SIZES))
+D3 = np.maximum(1 - 3 * D3_SIGMA / D2, 0)
+D4 = 1 + 3 * D3_SIGMA / D2
+A3 = 3 / (C4 * np.sqrt(SUBGROUP_SIZES))
+B3 = np.maximum(1 - 3 * np.sqrt(1 - C4 ** 2) / C4, 0)
+B4 = 1 + 3 * np.sqrt(1 - C4 ** 2) / C4
+
+CONSTANTS = {'d2': D2, 'd3': D3_SIGMA, 'c4': C4, 'A2': A2, 'A3': A3,
+             'D3': D3, 'D4': D4, 'B3': B3, 'B4': B4}
+
+
+def constants(n: int) -> dict:
+    """Scaling constants for subgroups of size ``n``."""
+    if not SUBGROUP_SIZES[0] <= n <= SUBGROUP_SIZES[-1]:
+        raise ValueError('subgroup size must be between {} and {}'.format(
+            SUBGROUP_SIZES[0], SUBGROUP_SIZES[-1]))
+    i = n - SUBGROUP_SIZES[0]
+    return {name: float(table[i]) for name, table in CONSTANTS.items()}
+
+
+class SubgroupLimits(NamedTuple):
+    """Limits of the averages chart and of the range or standard deviation chart."""
+    mean: float
+    upl: float
+    lpl: float
+    spread: float
+    url: float
+    lrl: float
+
+
+class SubgroupResult:
+    """Subgroup averages and spreads (ranges or standard deviations) with limits."""
+    __slots__ = ('kind', 'n', 'averages', 'spreads', 'limits')
+
+    def __init__(self, kind: str, n: int, averages: np.ndarray, spreads: np.ndarray,
+                 limits: SubgroupLimits):
+        self.kind = kind
+        self.n = n
+        self.averages = averages
+        self.spreads = spreads
+        self.limits = limits
+
+    def __len__(self):
+        return len(self.averages)
+
+    def __repr__(self):
+        return 'SubgroupResult(kind={!r}, n={}, subgroups={}, limits={})'.format(
+            self.kind, self.n, len(self), self.limits)
+
+    @property
+    def spread_label(self) -> str:
+        return 'Range' if self.kind == 'xbar_r' else 'Standard deviation'
+
+
+def _subgroups(values, n: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 2:
+        return values
+    # A trailing incomplete subgroup is left out
+    m = len(values) // n
+    if m == 0:
+        raise ValueError('need at least one complete subgroup of {}'.format(n))
+    return values[:m * n].reshape(m, n)
+
+
+def compute_subgroups(values, n: Optional[int] = None, kind: str = 'xbar_r',
+                      lpl_floor: Optional[float] = None) -> SubgroupResult:
+    """Compute an Xbar-R (``kind='xbar_r'``) or Xbar-S (``kind='xbar_s'``) chart.
+
+    ``values`` is either a flat series split into consecutive subgroups of
+    ``n`` or a 2-D array with one subgroup per row.
+    """
+    if kind not in ('xbar_r', 'xbar_s'):
+        raise ValueError("kind must be 'xbar_r' or 'xbar_s'")
+    if n is None and np.ndim(values) != 2:
+        raise ValueError('give the subgroup size n for a flat series')
+    groups = _subgroups(values, n)
+    n = groups.shape[1]
+    k = constants(n)
+
+    averages = groups.mean(axis=1)
+    if kind == 'xbar_r':
+        spreads = groups.max(axis=1) - groups.min(axis=1)
+        scale, lower, upper = k['A2'], k['D3'], k['D4']
+    else:
+        spreads = groups.std(axis=1, ddof=1)
+        scale, lower, upper = k['A3'], k['B3'], k['B4']
+
+    mean = float(averages.mean())
+    spread = float(spreads.mean())
+    lpl = mean - scale * spread
+    if lpl_floor is not None:
+        lpl = max(lpl, lpl_floor)
+    limits = SubgroupLimits(mean, mean + scale * spread, lpl, spread,
+                            upper * spread, lower * spread)
+    return SubgroupResult(kind, n, averages, spreads, limits)
+
+
+def subgroup_signals(result: SubgroupResult, rules=RULES) -> SignalReport:
+    """Special cause rules on the averages, and spreads above their upper limit."""
+    limits = result.limits
+    return detect_signals(result.averages, limits.mean, limits.upl, limits.lpl,
+                          result.spreads, limits.url, rules)
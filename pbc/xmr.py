@@ -0,0 +1,206 @@
+"""XmR chart (individual values and moving range) computation.
+
+The limits are computed with NumPy on a single float array. The columns used
+by the lessons (moving range, constant limit columns) are only built when
+they are asked for.
+
+Besides the usual average moving range, limits can be based on the median
+moving range, which a few very large ranges do not inflate, and on a
+baseline from which out-of-limit points are removed until none are left.
+Both only use linear time selection and masking, never a full sort.
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Scaling constant converting the AmR into limits for individual values
+C1 = 2.66
+# Scaling constant converting the AmR into the upper range limit
+C2 = 3.27
+# The same constants for the median moving range
+C1_MEDIAN = 3.145
+C2_MEDIAN = 3.865
+
+# Scaling constants per way of summarizing the moving ranges
+METHODS = {'average': (C1, C2), 'median': (C1_MEDIAN, C2_MEDIAN)}
+
+# Columns understood by XmRResult.column and XmRResult.to_frame
+COLUMNS = ('Value', 'Moving range', 'AmR', 'UPL', 'LPL', 'URL', 'Mean')
+
+
+class XmRLimits(NamedTuple):
+    """Scalar statistics of an XmR chart.
+
+    ``amr`` is the average moving range, or the median moving range when
+    ``method`` is 'median'.
+    """
+    mean: float
+    amr: float
+    upl: float
+    lpl: float
+    url: float
+    method: str = 'average'
+
+    @classmethod
+    def from_stats(cls, mean: float, amr: float, lpl_floor: Optional[float] = None,
+                   method: str = 'average') -> 'XmRLimits':
+        c1, c2 = METHODS[method]
+        lpl = mean - c1 * amr
+        if lpl_floor is not None:
+            lpl = max(lpl, lpl_floor)
+        return cls(mean, amr, mean + c1 * amr, lpl, c2 * amr, method)
+
+    def rounded(self, decimals: int,
+                lpl_floor: Optional[float] = None) -> 'XmRLimits':
+        """Round the limits the way they are calculated by hand.
+
+        The mean and AmR are rounded first and the process limits are then
+        calculated from the rounded values.
+        """
+        c1, c2 = METHODS[self.method]
+        mean = round(self.mean, decimals)
+        amr = round(self.amr, decimals)
+        lpl = round(mean - c1 * amr, decimals)
+        if lpl_floor is not None:
+            lpl = max(lpl, lpl_floor)
+        return XmRLimits(mean, amr, round(mean + c1 * amr, decimals), lpl,
+                         round(c2 * amr, decimals), self.method)
+
+
+class XmRResult:
+    """Values of an XmR chart together with their limits.
+
+    ``values`` is the input as a float array (a view when the input already
+    is one) and ``limits`` holds the scalar statistics. Everything else is
+    derived on demand and not kept, so a cached result costs one float array.
+    """
+    __slots__ = ('values', 'limits', 'index')
+
+    def __init__(self, values: np.ndarray, limits: XmRLimits,
+                 index: Optional[pd.Index] = None):
+        self.values = values
+        self.limits = limits
+        self.index = index
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'XmRResult(n={}, limits={})'.format(len(self), self.limits)
+
+    @property
+    def moving_range(self) -> np.ndarray:
+        """Moving ranges aligned with ``values``; the first one is NaN."""
+        mr = np.empty(len(self.values))
+        mr[:1] = np.nan
+        np.abs(np.diff(self.values), out=mr[1:])
+        return mr
+
+    def column(self, name: str, limits: Optional[XmRLimits] = None) -> np.ndarray:
+        """Return one of ``COLUMNS`` as an array.
+
+        Constant columns are read-only broadcast views, so they take no
+        memory. Pass ``limits`` to fill them with e.g. rounded limits.
+        """
+        limits = self.limits if limits is None else limits
+        if name == 'Value':
+            return self.values
+        if name == 'Moving range':
+            return self.moving_range
+        constants = {'AmR': limits.amr, 'UPL': limits.upl, 'LPL': limits.lpl,
+                     'URL': limits.url, 'Mean': limits.mean}
+        if name not in constants:
+            raise KeyError(name)
+        return np.broadcast_to(np.float64(constants[name]), self.values.shape)
+
+    def to_frame(self, columns=COLUMNS, base: Optional[pd.DataFrame] = None,
+                 limits: Optional[XmRLimits] = None, rows=None) -> pd.DataFrame:
+        """Build a DataFrame for display.
+
+        When ``base`` is given its columns come first and the requested
+        columns are appended to them. ``rows`` (positions or a boolean mask)
+        selects rows before anything is materialized.
+        """
+        data = {name: self.column(name, limits) for name in columns}
+        index = self.index
+        if rows is not None:
+            data = {name: column[rows] for name, column in data.items()}
+            base = base.iloc[rows] if base is not None else None
+            index = index[rows] if index is not None else None
+        if base is not None:
+            return base.assign(**data)
+        return pd.DataFrame(data, index=index)
+
+
+def _median(values: np.ndarray) -> float:
+    # Median by selection (np.partition) rather than a full sort
+    n = len(values)
+    if n == 0:
+        return float('nan')
+    k = n // 2
+    if n % 2:
+        return float(np.partition(values, k)[k])
+    part = np.partition(values, (k - 1, k))
+    return float((part[k - 1] + part[k]) / 2)
+
+
+def _summarize(values: np.ndarray, abs_diff: np.ndarray, method: str):
+    # Mean of the values and average or median moving range, ignoring NaNs
+    mean = float(np.nanmean(values)) if len(values) else float('nan')
+    if method == 'median':
+        return mean, _median(abs_diff[~np.isnan(abs_diff)])
+    return mean, float(np.nanmean(abs_diff)) if len(abs_diff) else float('nan')
+
+
+def baseline_limits(values: np.ndarray, abs_diff: np.ndarray,
+                    lpl_floor: Optional[float] = None, method: str = 'average',
+                    max_iter: int = 10):
+    """Limits from a baseline without out-of-limit points.
+
+    Points outside the process limits, and moving ranges above the URL or
+    touching a removed point, are dropped and the limits recomputed until
+    nothing else falls outside (or ``max_iter`` rounds). Returns the limits
+    and a boolean mask of the points kept in the baseline.
+    """
+    keep = ~np.isnan(values)
+    keep_mr = keep[1:] & keep[:-1]
+    for _ in range(max_iter):
+        mean, amr = _summarize(values[keep], abs_diff[keep_mr], method)
+        limits = XmRLimits.from_stats(mean, amr, lpl_floor, method)
+        inside = keep & (values <= limits.upl) & (values >= limits.lpl)
+        inside_mr = keep_mr & inside[1:] & inside[:-1] & (abs_diff <= limits.url)
+        if (inside.sum() == keep.sum() and inside_mr.sum() == keep_mr.sum()) \
+                or not inside.any():
+            break
+        keep, keep_mr = inside, inside_mr
+    return limits, keep
+
+
+def compute_xmr(values, lpl_floor: Optional[float] = None, method: str = 'average',
+                exclude_outliers: bool = False) -> XmRResult:
+    """Compute the XmR chart of ``values``.
+
+    ``values`` can be a Series or anything ``np.asarray`` accepts; it is not
+    copied when it is already a float64 array. Missing values are ignored
+    in the mean and AmR. Use ``lpl_floor`` for data that cannot go below a
+    natural boundary such as zero.
+
+    ``method='median'`` bases the limits on the median moving range.
+    ``exclude_outliers`` computes them from a baseline without the points
+    outside the limits (see :func:`baseline_limits`).
+    """
+    if method not in METHODS:
+        raise ValueError('method must be one of {}'.format(', '.join(METHODS)))
+    index = values.index if isinstance(values, pd.Series) else None
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or len(values) == 0:
+        raise ValueError('compute_xmr needs a non-empty one dimensional series')
+
+    abs_diff = np.abs(np.diff(values))
+    if exclude_outliers:
+        limits, _ = baseline_limits(values, abs_diff, lpl_floor, method)
+    else:
+        mean, amr = _summarize(values, abs_diff, method)
+        limits = XmRLimits.from_stats(mean, amr, lpl_floor, method)
+    return XmRResult(values, limits, index)
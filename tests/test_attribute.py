@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from pbc.attribute import attribute_signals, compute_attribute
+
+
+def test_p_chart():
+    counts = np.array([2.0, 4.0, 3.0])
+    sizes = np.array([100.0, 100.0, 50.0])
+    result = compute_attribute(counts, sizes, 'p')
+    rate = 9 / 250
+    np.testing.assert_allclose(result.values, counts / sizes)
+    np.testing.assert_allclose(result.center, rate)
+    np.testing.assert_allclose(result.upl, rate + 3 * np.sqrt(rate * (1 - rate) / sizes))
+    assert (result.lpl >= 0).all()
+
+
+def test_c_chart_needs_no_sizes():
+    result = compute_attribute([4.0, 9.0, 2.0, 25.0], kind='c')
+    assert result.limits.center == pytest.approx(10.0)
+    np.testing.assert_array_equal(attribute_signals(result).indices('beyond_limits'), [3])
+
+
+def test_scalar_size():
+    result = compute_attribute([1.0, 2.0], 10, 'u')
+    np.testing.assert_allclose(result.values, [0.1, 0.2])
+
+
+@pytest.mark.parametrize('counts, sizes, kind', [
+    ([1.0, -1.0], [10, 10], 'p'),
+    ([1.0, np.nan], [10, 10], 'u'),
+    ([1.0, 2.0], [10, 0], 'u'),
+    ([1.0, 2.0], [10, -5], 'np'),
+    ([1.0, 2.0], [10, np.nan], 'p'),
+    ([1.0, 20.0], [10, 10], 'p'),
+    ([1.0, 2.0], None, 'p'),
+    ([1.0, 2.0], [10, 10], 'x'),
+    ([], None, 'c'),
+])
+def test_invalid_input(counts, sizes, kind):
+    with pytest.raises(ValueError):
+        compute_attribute(counts, sizes, kind)
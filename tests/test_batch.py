@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pbc.batch import compute_batch
+from pbc.rules import xmr_signals
+from pbc.xmr import compute_xmr
+
+
+def _frame(rng, series=20):
+    frames = []
+    for i in range(series):
+        n = int(rng.integers(1, 60))
+        values = rng.normal(i, 1 + i % 3, n)
+        values[rng.random(n) < 0.05] = np.nan
+        if n > 10:
+            values[5] += 20
+        frames.append(pd.DataFrame({'series_id': 's{:02d}'.format(i),
+                                    'timestamp': np.arange(n), 'value': values}))
+    # Rows arrive in no particular order
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.sample(frac=1, random_state=0)
+
+
+@pytest.mark.parametrize('processes', [1, 3])
+def test_matches_per_series(processes):
+    frame = _frame(np.random.default_rng(1))
+    batch = compute_batch(frame, processes=processes)
+    assert list(batch.index) == sorted(frame['series_id'].unique())
+    for name, group in frame.groupby('series_id'):
+        values = group.sort_values('timestamp')['value'].to_numpy()
+        result = compute_xmr(values)
+        row = batch.loc[name]
+        assert row['n'] == np.count_nonzero(~np.isnan(values))
+        for field in ('mean', 'amr', 'upl', 'lpl', 'url'):
+            np.testing.assert_allclose(row[field], getattr(result.limits, field))
+        report = xmr_signals(result)
+        for rule, count in report.counts().items():
+            assert row[rule] == count, (name, rule)
+        assert row['signals'] == report.any().sum()
+
+
+def test_lpl_floor():
+    frame = pd.DataFrame({'series_id': 'a', 'timestamp': range(4),
+                          'value': [0.1, 3.0, 0.2, 4.0]})
+    assert compute_batch(frame, lpl_floor=0.0, rules=())['lpl'].iloc[0] == 0.0
+
+
+def test_empty():
+    frame = pd.DataFrame({'series_id': [], 'timestamp': [], 'value': []})
+    assert compute_batch(frame).empty
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pbc.cache import LRUCache, data_hash
+
+
+def test_data_hash_covers_the_index():
+    values = [1.0, 2.0, 3.0]
+    assert data_hash(pd.Series(values)) != data_hash(pd.Series(values, index=[1, 2, 3]))
+    assert data_hash(pd.Series(values, index=['a', 'b', 'c'])) != \
+        data_hash(pd.Series(values, index=['a', 'b', 'd']))
+
+
+def test_data_hash():
+    values = [1.0, 2.0, 3.0]
+    assert data_hash(pd.Series(values)) == data_hash(pd.Series(values))
+    assert data_hash(np.array(values)) != data_hash(np.array([1.0, 2.0, 4.0]))
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+
+
+def test_byte_bound():
+    cache = LRUCache(maxsize=10, maxbytes=1000)
+    cache.put('small', np.zeros(50))
+    cache.put('large', np.zeros(500))
+    assert 'small' in cache and 'large' not in cache
+    cache.put('other', np.zeros(80))
+    assert cache.nbytes <= 1000 and 'small' not in cache
+
+
+def test_get_or_compute_counts_hits():
+    cache = LRUCache()
+    assert cache.get_or_compute('key', lambda: 1) == 1
+    assert cache.get_or_compute('key', lambda: 2) == 1
+    assert cache.stats()[:3] == (1, 1, 1)
+
+
+def test_single_flight():
+    cache = LRUCache()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.get_or_compute('key', compute))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 4 and len(calls) == 1
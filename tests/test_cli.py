@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pbc.cli import main
+from pbc.xmr import compute_xmr
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = []
+    for i in range(2):
+        path = tmp_path / 'series{}.csv'.format(i)
+        values = np.random.default_rng(i).normal(10, 1, 40)
+        pd.DataFrame({'Value': values}).to_csv(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_json_to_stdout(inputs, capsys):
+    assert main(['compute', *inputs, '--jobs', '2']) == 0
+    printed = json.loads(capsys.readouterr().out)
+    assert [result['source'] for result in printed] == inputs
+
+
+@pytest.mark.parametrize('count', [1, 2])
+def test_json_is_always_a_list(inputs, tmp_path, capsys, count):
+    out = tmp_path / 'limits.json'
+    assert main(['compute', *inputs[:count], '--out', str(out)]) == 0
+    written = json.loads(out.read_text())
+    assert main(['compute', *inputs[:count], '--jobs', '2']) == 0
+    printed = json.loads(capsys.readouterr().out)
+    assert isinstance(written, list) and len(written) == count
+    assert written == printed
+
+
+def test_limits_match_compute_xmr(inputs, tmp_path):
+    out = tmp_path / 'limits.csv'
+    main(['compute', *inputs, '--out', str(out), '--chunksize', '7'])
+    table = pd.read_csv(out)
+    for path, upl in zip(inputs, table['upl']):
+        values = pd.read_csv(path)['Value']
+        assert upl == pytest.approx(compute_xmr(values).limits.upl)
+
+
+def test_missing_limits_are_null(tmp_path, capsys):
+    path = tmp_path / 'one.csv'
+    pd.DataFrame({'Value': [1.0]}).to_csv(path)
+    assert main(['compute', str(path)]) == 0
+    result, = json.loads(capsys.readouterr().out)
+    assert result['limits']['amr'] is None and result['limits']['mean'] == 1.0
+
+
+@pytest.mark.parametrize('out', ['limits.json', 'limits.csv'])
+def test_failed_inputs_get_an_error_entry(inputs, tmp_path, out):
+    missing = str(tmp_path / 'missing.csv')
+    out = tmp_path / out
+    assert main(['compute', inputs[0], missing, '--jobs', '2', '--out', str(out)]) == 1
+    if out.suffix == '.json':
+        good, bad = json.loads(out.read_text())
+        assert 'limits' in good and 'error' not in good
+    else:
+        good, bad = pd.read_csv(out).to_dict('records')
+        assert good['upl'] > 0
+    assert bad['source'] == missing and bad['error']
+
+
+def test_quiz_table_with_a_failed_input(inputs, tmp_path):
+    out = tmp_path / 'answers.csv'
+    assert main(['quiz', inputs[0], str(tmp_path / 'missing.csv'), '--out', str(out)]) == 1
+    table = pd.read_csv(out)
+    assert table['error'].isna().tolist() == [True, False]
+    assert table['mean_denominator'].iloc[0] == 40
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import pbc.export
+from pbc.export import EXCEL_MAX_ROWS, available_formats, export_path, frame_hash, prune
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pbc.export, 'EXPORT_DIR', tmp_path)
+    return tmp_path
+
+
+def test_csv_round_trip(monkeypatch):
+    monkeypatch.setattr(pbc.export, 'CHUNK_ROWS', 3)
+    df = pd.DataFrame({'Value': range(10)}, index=pd.Index(range(10, 20), name='Year'))
+    path = export_path(df)
+    assert path.suffix == '.csv'
+    pd.testing.assert_frame_equal(pd.read_csv(path, index_col='Year'), df)
+    # Written once and reused
+    assert export_path(df) == path
+
+
+def test_frame_hash_covers_the_index():
+    df = pd.DataFrame({'Value': [1.0, 2.0]})
+    assert frame_hash(df) != frame_hash(df.set_axis([5, 6]))
+
+
+def test_formats():
+    assert available_formats()[0] == 'csv'
+    with pytest.raises(ValueError):
+        pbc.export._write(pd.DataFrame(), 'json', None)
+
+
+def test_excel_row_limit():
+    assert 'xlsx' not in available_formats(EXCEL_MAX_ROWS)
+    with pytest.raises(ValueError):
+        pbc.export._write(pd.DataFrame(index=range(EXCEL_MAX_ROWS)), 'xlsx', None)
+
+
+def test_prune(export_dir):
+    now = time.time()
+    for age, name in enumerate(['new.csv', 'middle.csv', 'old.csv']):
+        path = export_dir / name
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (now - age * 10, now - age * 10))
+    stale = export_dir / 'half.csv.1-1.tmp'
+    stale.write_bytes(b'x')
+    os.utime(stale, (now - 7200, now - 7200))
+
+    prune(max_bytes=200, keep=export_dir / 'old.csv')
+    assert sorted(path.name for path in export_dir.iterdir()) == ['new.csv', 'old.csv']
@@ -0,0 +1,172 @@
+import http.server
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+import pbc.data
+from pbc.data import DatasetLoader
+from pbc.fetch import fetch_all
+
+CSV = b'Year,Value\n2020,1.5\n2021,2.5\n2022,3.5\n'
+ETAG = '"v1"'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Seconds every response is held back
+    delay = 0.0
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        time.sleep(self.delay)
+        # Through a proxy the request line holds the whole URL
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith('/hop/'):
+            # /hop/N redirects N more times before the data
+            hops = int(path.rsplit('/', 1)[1])
+            location = '/hop/{}'.format(hops - 1) if hops else '/data.csv'
+            self._reply(302, b'', Location=location)
+        elif path == '/data.csv':
+            if self.headers.get('If-None-Match') == ETAG:
+                self._reply(304, b'', ETag=ETAG)
+            else:
+                self._reply(200, CSV, ETag=ETAG)
+        else:
+            self._reply(404, b'missing')
+
+    def _reply(self, status, body, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    Handler.delay = 0.0
+
+
+def _url(server, path):
+    return 'http://127.0.0.1:{}{}'.format(server.server_port, path)
+
+
+def test_fetch_all_keeps_order_and_errors(server):
+    responses = fetch_all([_url(server, '/data.csv'), _url(server, '/nothing'),
+                           'ftp://example.com/data.csv', _url(server, '/hop/2')])
+    assert responses[0].status == 200 and responses[0].body == CSV
+    assert responses[0].headers['etag'] == ETAG
+    assert responses[1].status == 404
+    assert isinstance(responses[2], ValueError)
+    assert responses[3].status == 200 and responses[3].url.endswith('/data.csv')
+
+
+def test_etag_revalidation(server, tmp_path):
+    url = _url(server, '/data.csv')
+    loader = DatasetLoader(ttl=0, cache_dir=tmp_path)
+    first = loader.load(url)
+    assert list(first['Value']) == [1.5, 2.5, 3.5]
+    # Expired: revalidated with the ETag and answered with 304
+    assert loader.load_many([url])[0].equals(first)
+    assert server.requests[-1] == ('/data.csv', ETAG)
+
+    # A new loader revalidates with the ETag saved next to the on-disk copy
+    fresh = DatasetLoader(ttl=0, cache_dir=tmp_path).load_many([url])[0]
+    assert fresh.equals(first)
+    assert server.requests[-1] == ('/data.csv', ETAG)
+
+
+def test_fallback_to_the_disk_copy(server, tmp_path):
+    url = _url(server, '/data.csv')
+    DatasetLoader(cache_dir=tmp_path).load(url)
+    server.shutdown()
+    server.server_close()
+    frame = DatasetLoader(cache_dir=tmp_path, timeout=1).load_many([url])[0]
+    assert list(frame['Value']) == [1.5, 2.5, 3.5]
+
+
+def test_load_many_errors(server, tmp_path):
+    loader = DatasetLoader(cache_dir=tmp_path)
+    url = _url(server, '/nothing')
+    with pytest.raises(OSError):
+        loader.load_many([url])
+    assert isinstance(loader.load_many([url], return_exceptions=True)[0], OSError)
+
+
+def test_missing_source(server, tmp_path):
+    with pytest.raises(OSError):
+        DatasetLoader(cache_dir=tmp_path).load(_url(server, '/nothing'))
+
+
+def test_redirects(server, tmp_path):
+    frame = DatasetLoader(cache_dir=tmp_path).load(_url(server, '/hop/2'))
+    assert list(frame['Value']) == [1.5, 2.5, 3.5]
+
+
+def test_timeout_covers_the_redirects(server):
+    # Every hop is within the timeout, the chain as a whole is not
+    Handler.delay = 0.2
+    start = time.monotonic()
+    response, = fetch_all([_url(server, '/hop/4')], timeout=0.5)
+    assert isinstance(response, TimeoutError)
+    assert time.monotonic() - start < 1.0
+    response, = fetch_all([_url(server, '/hop/1')], timeout=2)
+    assert response.status == 200
+
+
+def test_load_many_passes_the_pool_limits(monkeypatch, tmp_path):
+    calls = []
+
+    def fetch_all(urls, headers=None, **kwargs):
+        calls.append(kwargs)
+        return [OSError('offline')] * len(urls)
+
+    monkeypatch.setattr(pbc.data, 'fetch_all', fetch_all)
+    loader = DatasetLoader(cache_dir=tmp_path, timeout=3)
+    loader.load_many(['http://example.com/a.csv'], return_exceptions=True,
+                     concurrency=4, per_host=2)
+    assert calls == [{'timeout': 3, 'concurrency': 4, 'per_host': 2}]
+
+
+def test_load_many_fetches_nothing_when_fresh(server, tmp_path, monkeypatch):
+    url = _url(server, '/data.csv')
+    loader = DatasetLoader(cache_dir=tmp_path)
+    loader.load(url)
+    monkeypatch.setattr(pbc.data, 'fetch_all', None)
+    assert loader.load_many([url, url])[1]['Value'].sum() == 7.5
+
+
+def test_load_many_downloads_once(server, tmp_path):
+    Handler.delay = 0.2
+    url = _url(server, '/data.csv')
+    loader = DatasetLoader(cache_dir=tmp_path)
+    frames = []
+    threads = [threading.Thread(target=lambda: frames.append(loader.load_many([url, url])))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(frames) == 4 and len(server.requests) == 1
+
+
+def test_proxy_from_the_environment(server, monkeypatch):
+    monkeypatch.setenv('HTTP_PROXY', _url(server, ''))
+    monkeypatch.setenv('NO_PROXY', '')
+    response, = fetch_all(['http://pbc.invalid/hop/1'])
+    assert response.status == 200 and response.body == CSV
+    assert server.requests[0][0] == 'http://pbc.invalid/hop/1'
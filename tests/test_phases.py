@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from pbc.changepoint import suggest_breakpoints
+from pbc.phases import PhaseIndex, phase_limits, phase_signals, stepped
+from pbc.xmr import compute_xmr
+
+
+def test_phase_limits_match_compute_xmr():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(10, 1, 50), rng.normal(20, 2, 70)])
+    values[[3, 60]] = np.nan
+    result = compute_xmr(values)
+    phases = phase_limits(result, [50, 90])
+    assert [(p.start, p.stop) for p in phases] == [(0, 50), (50, 90), (90, 120)]
+    for phase in phases:
+        # Moving ranges across a breakpoint belong to neither phase
+        expected = compute_xmr(values[phase.start:phase.stop]).limits
+        np.testing.assert_allclose(phase.limits[:5], expected[:5])
+
+
+def test_bounds_ignore_out_of_range_breakpoints():
+    index = PhaseIndex(compute_xmr(np.arange(10.0)))
+    assert index.bounds([0, 5, 5, 12]) == [(0, 5), (5, 10)]
+
+
+def test_stepped_and_signals():
+    values = np.array([1.0, 1.1, 0.9, 1.0, 5.0, 5.1, 4.9, 5.0])
+    result = compute_xmr(values)
+    phases = phase_limits(result, [4])
+    np.testing.assert_allclose(stepped(phases, 'mean'), [1.0] * 4 + [5.0] * 4)
+    assert not phase_signals(result, phases, ('beyond_limits',)).any().any()
+
+
+def test_suggest_breakpoints_finds_a_shift():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.normal(0, 1, 100), rng.normal(8, 1, 100)])
+    breakpoints = suggest_breakpoints(compute_xmr(values))
+    assert any(abs(b - 100) <= 2 for b in breakpoints)
+
+
+@pytest.mark.parametrize('min_size', [1, 5])
+def test_split_gains(min_size):
+    values = np.array([0.0] * 10 + [10.0] * 10)
+    split, gains = PhaseIndex(compute_xmr(values)).split_gains(0, 20, min_size)
+    assert split[0] == min_size and split[-1] == 20 - min_size
+    assert split[np.argmax(gains)] == 10
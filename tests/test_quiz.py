@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from pbc.quiz import QUESTIONS, answer_key, format_value, quiz_stats
+
+DATASETS = {
+    'random': np.random.default_rng(4).normal(60, 5, 30).round(1),
+    # Mean equal to the median and a negative calculated LPL
+    'symmetric': np.array([1.0, 9.0, 2.0, 8.0, 5.0, 3.0, 7.0, 4.0, 6.0, 5.0, 5.0]),
+    # Repeated values, so several moving ranges are equal or zero
+    'ties': np.array([3.0, 3.0, 4.0, 3.0, 3.0, 4.0, 4.0, 3.0, 4.0, 3.0, 3.0, 4.0]),
+    'short': np.array([4.0, 6.0, 5.0, 7.0, 5.0, 6.0, 4.0, 5.0]),
+    'gap': np.array([1.0, 2.0, np.nan] + list(range(4, 13)) + [np.nan]),
+}
+
+
+@pytest.mark.parametrize('name', sorted(DATASETS))
+def test_one_right_answer_and_distinct_choices(name):
+    key = answer_key(DATASETS[name])
+    for question, choices in key.choices.items():
+        labels = [label for label, _, _ in choices]
+        assert len(labels) == len(set(labels)), question
+        assert sum(correct for _, _, correct in choices) == 1, question
+        # Distractors replace wrong answers that equal the right one
+        assert len(choices) == len(QUESTIONS[question].choices), question
+
+
+def test_answers_follow_the_data():
+    values = DATASETS['random']
+    stats = quiz_stats(values)
+    answers = answer_key(values).answers()
+    assert answers['mean_numerator'] == format_value(round(values.sum(), 2))
+    assert answers['mean_denominator'] == str(len(values))
+    assert answers['UPL_Q1'] == format_value(stats['upl'])
+
+
+def test_questions_without_an_answer_are_left_out():
+    # Eight values have no tenth moving range
+    short = answer_key(DATASETS['short']).choices
+    assert len(short) < len(answer_key(DATASETS['random']).choices)
+    assert all(label != 'nan' for choices in short.values() for label, _, _ in choices)
+
+
+def test_lpl_note():
+    stats = quiz_stats(DATASETS['symmetric'])
+    assert stats['lpl'] == 0
+    assert stats['lpl_note'].startswith(' Because the values cannot be less than 0,')
+    assert quiz_stats(DATASETS['random'])['lpl_note'] == ''
+
+
+def test_format_value():
+    assert format_value(66.50) == '66.5'
+    assert format_value(60.0) == '60'
+    assert format_value(-0.0) == '0'
+
+
+def test_missing_values_are_not_counted():
+    stats = quiz_stats(DATASETS['gap'])
+    assert (stats['n'], stats['sum']) == (11, 75.0)
+    # 1->2 and 4->5 ... 11->12
+    assert (stats['n_mr'], stats['mr_sum']) == (9, 9.0)
+    assert stats['mean'] == round(75 / 11, 2)
+    assert stats['amr'] == 1.0
+    assert stats['last_value'] == 12.0
+    answers = answer_key(DATASETS['gap']).answers()
+    assert answers['mean_denominator'] == '11'
+    assert answers['AmR_denominator'] == '9'
+
+
+@pytest.mark.parametrize('name', sorted(DATASETS))
+def test_characterization_choices_keep_their_order(name):
+    key = answer_key(DATASETS[name])
+    for question in ('xchart_Q1', 'mRChart_Q1'):
+        labels = [label for label, _, _ in key.choices[question]]
+        assert labels == ['Predictable', 'Unpredictable']
+
+
+def test_lpl_feedback_uses_the_floor():
+    feedback = {label: text for label, text, _ in
+                answer_key(DATASETS['symmetric'], lpl_floor=0.5).choices['LPL_Q1']}
+    stats = quiz_stats(DATASETS['symmetric'], lpl_floor=0.5)
+    assert 'cannot be less than 0.5.' in feedback[format_value(stats['lpl_calc'])]
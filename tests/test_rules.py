@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from pbc.rules import RULES, detect_signals, xmr_signals
+from pbc.xmr import XmRLimits, XmRResult
+
+
+def _signals(values, rules=RULES):
+    # Center 0 and sigma 1
+    return detect_signals(values, 0.0, 3.0, -3.0, rules=rules)
+
+
+def test_beyond_limits():
+    report = _signals([0.0, 3.5, -1.0, -3.1], ('beyond_limits',))
+    np.testing.assert_array_equal(report.indices('beyond_limits'), [1, 3])
+    # A point on a limit, e.g. on an LPL floored at zero, is not beyond it
+    assert not detect_signals([0.0, 2.0, 1.0], 1.0, 2.0, 0.0, rules=('beyond_limits',)).any().any()
+
+
+def test_run_of_8_marks_the_eighth_point():
+    values = [-1.0] + [0.5] * 9
+    np.testing.assert_array_equal(_signals(values).indices('run_of_8'), [8, 9])
+
+
+def test_two_of_three():
+    values = [0.0, 2.5, 0.0, 2.5, 0.0]
+    np.testing.assert_array_equal(_signals(values).indices('two_of_three'), [3])
+    # Beyond two sigma on opposite sides does not count
+    assert not _signals([2.5, -2.5, 0.0]).masks['two_of_three'].any()
+
+
+def test_four_of_five():
+    values = [1.5, 1.5, 0.0, 1.5, 1.5]
+    np.testing.assert_array_equal(_signals(values).indices('four_of_five'), [4])
+
+
+def test_trend_of_6():
+    values = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.4]
+    np.testing.assert_array_equal(_signals(values).indices('trend_of_6'), [5])
+    assert not _signals(values[:5]).masks['trend_of_6'].any()
+
+
+def test_mr_above_url_and_array_limits():
+    values = np.array([0.0, 5.0, 0.0, 0.0])
+    result = XmRResult(values, XmRLimits.from_stats(0.0, 1.0))
+    np.testing.assert_array_equal(xmr_signals(result).indices('mr_above_url'), [1, 2])
+    # Limits per point
+    report = detect_signals(values, np.zeros(4), np.array([1, 6, 1, 1.0]),
+                            np.full(4, -1.0), rules=('beyond_limits',))
+    assert not report.any().any()
+
+
+def test_unknown_rule():
+    with pytest.raises(ValueError):
+        _signals([1.0], ('run_of_7',))
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from pbc.store import SummaryStore, summarize
+
+
+def test_round_trip(tmp_path):
+    store = SummaryStore(tmp_path / 'summaries.db')
+    values = np.random.default_rng(5).normal(10, 1, 500)
+    values[200] = 30
+    computed = store.get_or_compute(values, 'key')
+    reopened = SummaryStore(tmp_path / 'summaries.db')
+    stored = reopened.get_or_compute(values, 'key')
+    assert (reopened.hits, reopened.misses) == (1, 0)
+    assert stored.n == computed.n == 500
+    assert stored.limits == computed.limits
+    assert set(stored.signals) == set(computed.signals)
+    assert 200 in stored.signals['beyond_limits']
+    np.testing.assert_array_equal(stored.values, computed.values)
+    assert stored.signal_mask()[200]
+
+
+def test_summarize_keeps_signals():
+    values = np.random.default_rng(6).normal(0, 1, 50_000)
+    values[12_345] = 40
+    summary = summarize(values, rules=('beyond_limits',), max_points=500)
+    assert len(summary.points) <= 1000
+    assert 12_345 in summary.points
+
+
+@pytest.mark.skipif(hasattr(os, 'geteuid') and os.geteuid() == 0,
+                    reason='root can write to read-only directories')
+def test_unwritable_directory(tmp_path):
+    directory = tmp_path / 'read-only'
+    directory.mkdir()
+    directory.chmod(0o500)
+    try:
+        _assert_unavailable(SummaryStore(directory / 'sub' / 'summaries.db'))
+    finally:
+        directory.chmod(0o700)
+
+
+def test_path_that_is_a_file(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    _assert_unavailable(SummaryStore(blocker / 'summaries.db'))
+
+
+def _assert_unavailable(store):
+    assert not store.available
+    assert store.get('key') is None
+    summary = store.get_or_compute(np.arange(10.0), 'key')
+    assert summary.n == 10
+    store.evict()
+    store.clear()
+    assert not store.stats()['available']
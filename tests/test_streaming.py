@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from pbc.streaming import StreamingXmR, limits_from_chunks
+from pbc.xmr import compute_xmr
+
+
+def _values(seed, n=300):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(50, 5, n)
+    values[rng.random(n) < 0.1] = np.nan
+    # Runs of gaps, also at the start and the end
+    values[:2] = np.nan
+    values[100:104] = np.nan
+    values[-1] = np.nan
+    return values
+
+
+def _chunks(values, seed):
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.integers(0, len(values), 12))
+    return np.split(values, cuts)
+
+
+def _assert_limits(actual, expected):
+    np.testing.assert_allclose(actual[:5], expected[:5], rtol=1e-9)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_update_extend_and_chunks_match_compute_xmr(seed):
+    values = _values(seed)
+    expected = compute_xmr(values).limits
+
+    one_by_one = StreamingXmR()
+    for value in values:
+        one_by_one.update(value)
+    batched = StreamingXmR()
+    for chunk in _chunks(values, seed):
+        batched.extend(chunk)
+
+    _assert_limits(one_by_one.limits, expected)
+    _assert_limits(batched.limits, expected)
+    _assert_limits(limits_from_chunks(_chunks(values, seed)), expected)
+    np.testing.assert_array_equal(batched.values(), values)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_baseline(seed):
+    values = _values(seed)
+    baseline = 40
+    last = np.flatnonzero(~np.isnan(values))[baseline - 1]
+    expected = compute_xmr(values[:last + 1]).limits
+
+    batched = StreamingXmR(baseline=baseline)
+    for chunk in _chunks(values, seed):
+        batched.extend(chunk)
+    one_by_one = StreamingXmR(baseline=baseline)
+    for value in values:
+        one_by_one.update(value)
+
+    assert batched.frozen and one_by_one.frozen
+    _assert_limits(batched.limits, expected)
+    _assert_limits(one_by_one.limits, expected)
+    assert batched.count == np.count_nonzero(~np.isnan(values))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_window(seed):
+    values = _values(seed)
+    window = 25
+    streaming = StreamingXmR(window=window)
+    present = np.flatnonzero(~np.isnan(values))
+    for i, value in enumerate(values):
+        streaming.update(value)
+        seen = present[present <= i]
+        if len(seen) >= window:
+            expected = compute_xmr(values[seen[-window]:i + 1]).limits
+            _assert_limits(streaming.limits, expected)
+
+
+def test_values_are_read_only():
+    streaming = StreamingXmR()
+    streaming.extend([1.0, 2.0])
+    with pytest.raises(ValueError):
+        streaming.values()[0] = 5.0
+    with pytest.raises(ValueError):
+        StreamingXmR(keep_values=False).values()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        StreamingXmR(baseline=10, window=10)
+    with pytest.raises(ValueError):
+        StreamingXmR(window=1)
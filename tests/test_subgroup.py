@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from pbc.subgroup import compute_subgroups, constants, subgroup_signals
+
+# Published constants for subgroups of 2, 5 and 10
+TABLE = {
+    2: {'d2': 1.128, 'A2': 1.880, 'D3': 0.0, 'D4': 3.267, 'c4': 0.7979, 'A3': 2.659,
+        'B3': 0.0, 'B4': 3.267},
+    5: {'d2': 2.326, 'A2': 0.577, 'D3': 0.0, 'D4': 2.114, 'c4': 0.9400, 'A3': 1.427,
+        'B3': 0.0, 'B4': 2.089},
+    10: {'d2': 3.078, 'A2': 0.308, 'D3': 0.223, 'D4': 1.777, 'c4': 0.9727, 'A3': 0.975,
+         'B3': 0.284, 'B4': 1.716},
+}
+
+
+@pytest.mark.parametrize('n', sorted(TABLE))
+def test_constants(n):
+    values = constants(n)
+    for name, expected in TABLE[n].items():
+        assert values[name] == pytest.approx(expected, abs=2e-3), name
+
+
+@pytest.mark.parametrize('n', [1, 26])
+def test_constants_out_of_range(n):
+    with pytest.raises(ValueError):
+        constants(n)
+
+
+def test_xbar_r():
+    values = np.array([[1.0, 2.0, 3.0], [2.0, 4.0, 6.0]])
+    result = compute_subgroups(values)
+    np.testing.assert_allclose(result.averages, [2.0, 4.0])
+    np.testing.assert_allclose(result.spreads, [2.0, 4.0])
+    k = constants(3)
+    assert result.limits.upl == pytest.approx(3.0 + k['A2'] * 3.0)
+    assert result.limits.url == pytest.approx(k['D4'] * 3.0)
+
+
+def test_xbar_s_and_flat_series():
+    values = np.arange(11, dtype=np.float64)
+    result = compute_subgroups(values, n=5, kind='xbar_s')
+    # The trailing incomplete subgroup is left out
+    assert len(result) == 2
+    np.testing.assert_allclose(result.spreads, np.std(np.arange(5.0), ddof=1))
+    assert result.spread_label == 'Standard deviation'
+    # A steady climb puts both averages outside the limits
+    np.testing.assert_array_equal(subgroup_signals(result).indices('beyond_limits'), [0, 1])
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        compute_subgroups(np.arange(10.0))
+    with pytest.raises(ValueError):
+        compute_subgroups(np.arange(3.0), n=5)
+    with pytest.raises(ValueError):
+        compute_subgroups(np.arange(10.0), n=5, kind='xbar_x')
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pbc.xmr import C1, C2, compute_xmr
+
+
+def test_limits():
+    values = np.array([5.0, 7.0, 6.0, 9.0, 8.0])
+    limits = compute_xmr(values).limits
+    assert limits.mean == pytest.approx(7.0)
+    assert limits.amr == pytest.approx((2 + 1 + 3 + 1) / 4)
+    assert limits.upl == pytest.approx(7.0 + C1 * 1.75)
+    assert limits.lpl == pytest.approx(7.0 - C1 * 1.75)
+    assert limits.url == pytest.approx(C2 * 1.75)
+
+
+def test_lpl_floor():
+    limits = compute_xmr([0.1, 2.0, 0.2, 3.0], lpl_floor=0.0).limits
+    assert limits.lpl == 0.0
+
+
+def test_missing_values_are_left_out():
+    values = np.array([1.0, 3.0, np.nan, 2.0, 6.0])
+    limits = compute_xmr(values).limits
+    assert limits.mean == pytest.approx(3.0)
+    # Only 1->3 and 2->6 are moving ranges
+    assert limits.amr == pytest.approx(3.0)
+
+
+def test_no_copy_and_index():
+    values = np.arange(10, dtype=np.float64)
+    assert compute_xmr(values).values is values
+    series = pd.Series(values, index=pd.date_range('2020', periods=10))
+    assert compute_xmr(series).index.equals(series.index)
+
+
+def test_moving_range_and_frame():
+    result = compute_xmr([1.0, 4.0, 2.0])
+    np.testing.assert_array_equal(result.moving_range, [np.nan, 3.0, 2.0])
+    frame = result.to_frame()
+    assert list(frame.columns) == ['Value', 'Moving range', 'AmR', 'UPL', 'LPL', 'URL', 'Mean']
+    assert (frame['UPL'] == result.limits.upl).all()
+
+
+def test_median_method():
+    values = np.array([1.0, 2.0, 1.0, 2.0, 1.0, 50.0, 1.0])
+    limits = compute_xmr(values, method='median').limits
+    assert limits.amr == pytest.approx(1.0)
+    assert limits.method == 'median'
+
+
+def test_exclude_outliers():
+    rng = np.random.default_rng(0)
+    values = rng.normal(10, 1, 200)
+    values[100] = 100
+    plain = compute_xmr(values).limits
+    baseline = compute_xmr(values, exclude_outliers=True).limits
+    assert baseline.amr < plain.amr
+    assert baseline.upl < 100
+
+
+def test_rounded():
+    limits = compute_xmr([10.123, 11.456, 9.789]).limits.rounded(2)
+    assert limits.upl == round(limits.mean + C1 * limits.amr, 2)
+
+
+@pytest.mark.parametrize('values', [[], [[1.0, 2.0]]])
+def test_invalid_input(values):
+    with pytest.raises(ValueError):
+        compute_xmr(values)
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        compute_xmr([1.0, 2.0], method='mode')